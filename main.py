@@ -2,15 +2,22 @@ import argparse
 import asyncio
 import logging
 
+from proxy_scraper.browser_pool import browser_pool
+from proxy_scraper.distributed import Coordinator, run_worker
 from proxy_scraper.extractors.ip89 import IP89
 from proxy_scraper.extractors.ip3366 import IP3366
 from proxy_scraper.extractors.kuaidaili import KuaidailiScraper
 from proxy_scraper.extractors.proxydb import ProxyDBScraper
 from proxy_scraper.extractors.txt_proxy import TxtProxyScraper
 from proxy_scraper.extractors.zdaye import ZdayeScraper
+from proxy_scraper.http_client import http_client
+from proxy_scraper.pipeline import ProxyPipeline
 from proxy_scraper.proxy_file_manager import ProxyFileManager
+from proxy_scraper.proxy_health import HEALTH_CONFIG, ProxyHealthStore
 from proxy_scraper.proxy_validator import ProxyValidator
 from proxy_scraper.proxy_writer import ProxyWriter
+from proxy_scraper.sharding import ShardedValidator
+from proxy_scraper.util.aio import io_thread
 
 logger = logging.getLogger(__name__)
 
@@ -25,21 +32,32 @@ async def scrape_proxies():
     ]
 
     logger.info("Starting scraping proxies...")
-    scraping_tasks = [scraper.scrape() for scraper in scrapers]
-    await asyncio.gather(*scraping_tasks)
+    try:
+        await ProxyPipeline().scrape(scrapers)
+    finally:
+        await browser_pool.close()
+        await http_client.close()
     logger.info("Scraping proxies completed.")
 
-async def validate_proxies():
-    validator = ProxyValidator()
-    writer = ProxyWriter()
+async def validate_proxies(max_latency=None, top=None, workers=1, coordinator=None):
+    writer = ProxyWriter(max_latency=max_latency, top=top)
 
     try:
         logger.info("Starting proxy validation...")
-        proxies = ProxyFileManager.read_proxies_from_raw_directory()
-        valid_proxies = await validator.validate_proxies(proxies)
-        if valid_proxies:
-            writer.save_proxies(valid_proxies)
-            writer.save_country_proxies(valid_proxies)
+        if coordinator:
+            # Workers on any host check the proxies, this one hands out batches and writes the lists
+            host, port = coordinator.rsplit(':', 1)
+            await ProxyPipeline(writer=writer).save_valid(
+                Coordinator(host, int(port), local_workers=workers).iter_valid()
+            )
+        elif workers > 1:
+            # The worker processes check the proxies, this one resolves countries and writes the lists
+            await ProxyPipeline(writer=writer).save_valid(ShardedValidator(workers).iter_valid())
+        else:
+            health_store = ProxyHealthStore() if HEALTH_CONFIG.get('enabled', True) else None
+            validator = ProxyValidator(health_store=health_store)
+            total = await io_thread.run(ProxyFileManager.count_raw_proxies)
+            await ProxyPipeline(validator, writer).validate(ProxyFileManager.aiter_proxies_from_raw_directory(), total)
         logger.info("Proxy validation completed.")
     except Exception as e:
         logger.error(f"Error during proxy validation: {e}")
@@ -48,18 +66,35 @@ def main():
     parser = argparse.ArgumentParser(description="Proxy Scraper and Validator")
     parser.add_argument('--scrape', action='store_true', help="Scrape proxies")
     parser.add_argument('--validate', action='store_true', help="Validate proxies")
+    parser.add_argument(
+        '--max-latency', type=float, help="Only save proxies whose check took at most this many seconds"
+    )
+    parser.add_argument('--top', type=int, help="Only save the N fastest proxies per list")
+    parser.add_argument('--workers', type=int, default=1, help="Validate in N processes, each with its own event loop")
+    parser.add_argument(
+        '--coordinator',
+        metavar='HOST:PORT',
+        help="With --validate, serve batches to validation workers on HOST:PORT (--workers of them start locally)",
+    )
+    parser.add_argument('--worker', metavar='URL', help="Validate batches from the coordinator at URL")
     args = parser.parse_args()
 
-    if args.scrape and args.validate:
-        logger.error("You can only specify one action: --scrape or --validate.")
+    if sum(map(bool, (args.scrape, args.validate, args.worker))) > 1:
+        logger.error("You can only specify one action: --scrape, --validate or --worker.")
         return
 
-    if args.scrape:
+    if args.worker:
+        run_worker(args.worker, logging.getLogger().level)
+    elif args.scrape:
         asyncio.run(scrape_proxies())
     elif args.validate:
-        asyncio.run(validate_proxies())
+        asyncio.run(
+            validate_proxies(
+                max_latency=args.max_latency, top=args.top, workers=args.workers, coordinator=args.coordinator
+            )
+        )
     else:
-        logger.error("You must specify an action: --scrape or --validate.")
+        logger.error("You must specify an action: --scrape, --validate or --worker.")
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -0,0 +1,73 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from playwright.async_api import Browser, Page, Playwright, async_playwright
+
+from proxy_scraper.config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+BROWSER_CONFIG = CONFIG.get('browser', {})
+POOL_SIZE = BROWSER_CONFIG.get('pool_size', 4)
+
+BLOCKED_RESOURCE_TYPES = ["stylesheet", "image", "media", "font"]
+
+
+async def _block_resources(route, request):
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+class BrowserPool:
+    """One headless Chromium shared by every scraper, handing out at most ``size`` pages at a time.
+
+    The browser is launched on first use. Each page gets its own context so cookies
+    and init scripts do not leak between sources, which costs milliseconds instead of
+    a whole browser start.
+    """
+
+    def __init__(self, size: int = POOL_SIZE):
+        self.size = size
+        self._playwright: Optional[Playwright] = None
+        self._browser: Optional[Browser] = None
+        self._lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(size)
+
+    async def _get_browser(self) -> Browser:
+        async with self._lock:
+            if self._browser is None or not self._browser.is_connected():
+                if self._playwright is None:
+                    self._playwright = await async_playwright().start()
+                logger.info("Launching shared Chromium browser")
+                self._browser = await self._playwright.chromium.launch(headless=True)
+            return self._browser
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator[Page]:
+        async with self._semaphore:
+            browser = await self._get_browser()
+            context = await browser.new_context()
+            try:
+                await context.add_init_script("Object.defineProperties(navigator, {webdriver:{get:()=>false}});")
+                page = await context.new_page()
+                await page.route("**/*", _block_resources)
+                yield page
+            finally:
+                await context.close()
+
+    async def close(self):
+        async with self._lock:
+            if self._browser is not None:
+                await self._browser.close()
+                self._browser = None
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+                logger.info("Closed shared Chromium browser")
+
+
+browser_pool = BrowserPool()
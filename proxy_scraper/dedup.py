@@ -0,0 +1,91 @@
+import logging
+import math
+from array import array
+from typing import Iterable, Optional
+
+from proxy_scraper.proxy import Proxy
+from proxy_scraper.proxy_batch import proxy_key
+from proxy_scraper.raw_store import get_raw_store
+
+logger = logging.getLogger(__name__)
+
+MASK64 = (1 << 64) - 1
+
+
+def mix_key(key: int) -> int:
+    # splitmix64 finalizer: packed keys differ in few bits, so spread them before indexing
+    key = (key + 0x9E3779B97F4A7C15) & MASK64
+    key = ((key ^ (key >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    key = ((key ^ (key >> 27)) * 0x94D049BB133111EB) & MASK64
+    return key ^ (key >> 31)
+
+
+class BloomFilter:
+    """Set membership for integer keys in about 1.8 bytes per key at a 0.1% false positive rate.
+
+    ``key in bloom`` is never wrong when it says no; it says yes for a key that was never
+    added with probability ``error_rate`` once ``capacity`` keys have been added.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: int):
+        # Double hashing: k positions from the two halves of one 64-bit hash
+        mixed = mix_key(key)
+        first, step = mixed & 0xFFFFFFFF, (mixed >> 32) | 1
+        size = self.size
+        return [(first + i * step) % size for i in range(self.hash_count)]
+
+    def add(self, key: int):
+        bits = self.bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: int) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    @classmethod
+    def from_keys(cls, keys: Iterable[int], error_rate: float = 0.001) -> 'BloomFilter':
+        keys = keys if hasattr(keys, '__len__') else array('Q', keys)
+        bloom = cls(len(keys), error_rate)
+        for key in keys:
+            bloom.add(key)
+        return bloom
+
+
+class ProxyDeduplicator:
+    """Run-wide filter that lets each (ip, port, protocol) through once, whatever source it came from.
+
+    Keys are packed ints rather than Proxy objects. With a ``history`` filter, proxies that
+    are already in it, such as the ones in the raw lists on disk, are dropped as well.
+    """
+
+    def __init__(self, history: Optional[BloomFilter] = None):
+        self.history = history
+        self.seen = set()
+        self.duplicates = 0
+        self.known = 0
+
+    def is_new(self, proxy: Proxy) -> bool:
+        key = proxy_key(proxy)
+        if key in self.seen:
+            self.duplicates += 1
+            return False
+        self.seen.add(key)
+        if self.history is not None and key in self.history:
+            self.known += 1
+            return False
+        return True
+
+    @classmethod
+    def from_raw_directory(cls, directory: str, error_rate: float = 0.001) -> 'ProxyDeduplicator':
+        # The raw store already holds the keys, read from the .idx files, so no list is parsed again
+        keys = get_raw_store(directory).keys()
+        history = BloomFilter.from_keys(keys, error_rate)
+        logger.info(f"Loaded {len(keys)} known proxies from {directory} into a {len(history.bits)} byte Bloom filter")
+        return cls(history)
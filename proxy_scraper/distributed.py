@@ -0,0 +1,396 @@
+import asyncio
+import hmac
+import logging
+import multiprocessing
+import os
+import secrets
+import socket
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+from aiohttp import ClientError, ClientSession, ClientTimeout, web
+
+from proxy_scraper.config import CONFIG
+from proxy_scraper.dedup import ProxyDeduplicator
+from proxy_scraper.proxy import Proxy, ProxyTiming
+from proxy_scraper.proxy_batch import ProxyBatch
+from proxy_scraper.proxy_file_manager import RAW_DIR, ProxyFileManager
+from proxy_scraper.proxy_validator import ProxyValidator
+from proxy_scraper.util.aio import io_thread, join_processes
+
+logger = logging.getLogger(__name__)
+
+DISTRIBUTED_CONFIG = CONFIG.get('distributed', {})
+# Proxies per LeasedBatch
+BATCH_SIZE = DISTRIBUTED_CONFIG.get('batch_size', 1000)
+# Lifetime of a lease, extended by /renew; _reap queues the batches past it again
+LEASE_TIMEOUT = DISTRIBUTED_CONFIG.get('lease_timeout', 60)
+# Leases per batch before _reap gives it up
+MAX_ATTEMPTS = DISTRIBUTED_CONFIG.get('max_attempts', 3)
+# maxsize of Coordinator.results
+RESULT_QUEUE_SIZE = DISTRIBUTED_CONFIG.get('result_queue_size', 8)
+# Sleep of ValidationWorker.run after a 204; _release_workers keeps answering 410 for twice as long
+POLL_INTERVAL = DISTRIBUTED_CONFIG.get('poll_interval', 2)
+# Attempts per request in ValidationWorker._post
+REQUEST_RETRIES = DISTRIBUTED_CONFIG.get('request_retries', 5)
+REQUEST_TIMEOUT = 30
+# Bearer token checked by Coordinator._authorize; the environment variable takes precedence over config.toml
+TOKEN = os.environ.get('PROXY_SCRAPER_TOKEN') or DISTRIBUTED_CONFIG.get('token') or None
+
+# Put on the results queue once every batch is finished
+DONE = None
+
+# host, port, protocol, username, password, country
+ProxyRow = List
+
+
+def encode_proxy(proxy: Proxy) -> ProxyRow:
+    return [proxy.host, proxy.port, proxy.protocol.value, proxy.username, proxy.password, proxy.country]
+
+
+def decode_proxy(row: ProxyRow) -> Proxy:
+    host, port, protocol, username, password, country = row
+    return Proxy(host, port, protocol, username=username, password=password, country=country)
+
+
+class LeasedBatch:
+    def __init__(self, batch_id: int, proxies: ProxyBatch):
+        self.id = batch_id
+        self.proxies = proxies
+        self.attempts = 0
+        self.worker: Optional[str] = None
+        # Every worker that held a lease on the batch, so a late result can be told from a stray one
+        self.holders: Set[str] = set()
+        self.expires_at = 0.0
+
+
+class Coordinator:
+    """Hands batches of the raw lists to validation workers over HTTP and collects the results.
+
+    Workers, on this host or any other, pull work with ``POST /lease`` and get a batch
+    for ``lease_timeout`` seconds, which they extend with ``POST /renew/<id>`` while they
+    check it. ``POST /results/<id>`` returns the valid proxies with their timings. A batch
+    whose lease runs out, e.g. because its worker died, goes back to the queue for another
+    worker, up to ``max_attempts`` leases. The first result for a batch wins; late results
+    of an expired lease are still accepted if nobody finished the batch in the meantime,
+    even once the batch was given up, as long as the run has not finished. Results from a
+    worker that never leased the batch are rejected with 403.
+
+    Every request must carry ``Authorization: Bearer <token>``. Without a configured
+    token (``PROXY_SCRAPER_TOKEN`` or ``distributed.token``) the coordinator generates
+    one and logs it, so no worker is let in by default.
+
+    A batch is only read from the raw lists when a worker asks for one, and ``iter_valid``
+    yields the results as they come in, so the coordinator's memory does not grow with
+    the size of the lists. Once all batches are done, workers that ask for more get
+    410 Gone and stop. ``local_workers`` worker processes are started on this host as well.
+    """
+
+    def __init__(
+        self,
+        host: str = '0.0.0.0',
+        port: int = 8765,
+        directory: str = RAW_DIR,
+        batch_size: int = BATCH_SIZE,
+        lease_timeout: float = LEASE_TIMEOUT,
+        max_attempts: int = MAX_ATTEMPTS,
+        result_queue_size: int = RESULT_QUEUE_SIZE,
+        local_workers: int = 0,
+        token: Optional[str] = TOKEN,
+    ):
+        self.host = host
+        self.port = port
+        self.directory = directory
+        self.batch_size = batch_size
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self.result_queue_size = result_queue_size
+        self.local_workers = local_workers
+        self.token = token or secrets.token_urlsafe(24)
+        if token is None:
+            logger.warning(f"No distributed token configured, workers must use PROXY_SCRAPER_TOKEN={self.token}")
+        self.batches: Dict[int, LeasedBatch] = {}
+        # Given up by _reap; a late result from one of their holders is still accepted until the run finishes
+        self.abandoned: Dict[int, LeasedBatch] = {}
+        self.pending: Deque[int] = deque()
+        self.workers: Set[str] = set()
+        self.released: Set[str] = set()
+        self.finished = False
+        self.completed = 0
+        self.failed = 0
+        self.deduplicator = ProxyDeduplicator()
+        self.results: Optional[asyncio.Queue] = None
+        self._source: Optional[Iterator[ProxyBatch]] = None
+        self._next_id = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def url(self) -> str:
+        host = '127.0.0.1' if self.host in ('', '0.0.0.0') else self.host
+        return f"http://{host}:{self.port}"
+
+    async def iter_valid(self) -> AsyncIterator[Tuple[Proxy, ProxyTiming]]:
+        self.results = asyncio.Queue(maxsize=self.result_queue_size)
+        self._source = ProxyFileManager.iter_proxy_chunks(self.directory, self.batch_size)
+        app = web.Application(middlewares=[self._authorize])
+        app.add_routes([
+            web.post('/lease', self._handle_lease),
+            web.post('/renew/{batch_id}', self._handle_renew),
+            web.post('/results/{batch_id}', self._handle_results),
+        ])
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, self.host, self.port).start()
+        logger.info(f"Coordinator listening on {self.host}:{self.port}")
+
+        processes = start_local_workers(self.url, self.local_workers, self.token)
+        reaper = asyncio.create_task(self._reap())
+        try:
+            while (items := await self.results.get()) is not DONE:
+                for item in items:
+                    yield item
+            await self._release_workers()
+        finally:
+            reaper.cancel()
+            await asyncio.gather(reaper, return_exceptions=True)
+            await runner.cleanup()
+            if self._source is not None:
+                await io_thread.run(self._source.close)
+            for process in processes:
+                process.terminate()
+            await asyncio.to_thread(join_processes, processes)
+        logger.info(
+            f"Coordinator finished: {self.completed} batches validated, {self.failed} given up, "
+            f"{len(self.workers)} workers"
+        )
+
+    @web.middleware
+    async def _authorize(self, request: web.Request, handler) -> web.StreamResponse:
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        if scheme != 'Bearer' or not hmac.compare_digest(token.encode(), self.token.encode()):
+            logger.warning(f"Rejected unauthorized request to {request.path} from {request.remote}")
+            return web.Response(status=401)
+        return await handler(request)
+
+    async def _handle_lease(self, request: web.Request) -> web.Response:
+        worker = (await request.json()).get('worker', request.remote)
+        self.workers.add(worker)
+        async with self._lock:
+            batch = await self._next_batch()
+        if batch is None:
+            if self.finished:
+                self.released.add(worker)
+                return web.Response(status=410)
+            return web.Response(status=204)
+
+        batch.attempts += 1
+        batch.worker = worker
+        batch.holders.add(worker)
+        batch.expires_at = time.monotonic() + self.lease_timeout
+        logger.debug(f"Leased batch {batch.id} ({len(batch.proxies)} proxies) to {worker}, attempt {batch.attempts}")
+        return web.json_response({
+            'batch_id': batch.id,
+            'lease_timeout': self.lease_timeout,
+            'proxies': [encode_proxy(proxy) for proxy in batch.proxies],
+        })
+
+    async def _next_batch(self) -> Optional[LeasedBatch]:
+        while self.pending:
+            batch = self.batches.get(self.pending.popleft())
+            # Finished by a late result while it was waiting for another lease
+            if batch is not None:
+                return batch
+        while self._source is not None:
+            chunk = await io_thread.run(next, self._source, None)
+            if chunk is None:
+                self._source = None
+                await self._check_finished()
+                return None
+            proxies = ProxyBatch.from_proxies(proxy for proxy in chunk if self.deduplicator.is_new(proxy))
+            if proxies:
+                batch = LeasedBatch(self._next_id, proxies)
+                self._next_id += 1
+                self.batches[batch.id] = batch
+                return batch
+        return None
+
+    async def _handle_renew(self, request: web.Request) -> web.Response:
+        worker = (await request.json()).get('worker', request.remote)
+        batch = self.batches.get(int(request.match_info['batch_id']))
+        if batch is None or batch.worker != worker:
+            # Finished or leased to someone else; the worker may still send its result
+            return web.Response(status=409)
+        batch.expires_at = time.monotonic() + self.lease_timeout
+        return web.json_response({'lease_timeout': self.lease_timeout})
+
+    async def _handle_results(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        worker = data.get('worker', request.remote)
+        batch_id = int(request.match_info['batch_id'])
+        batch = self.batches.get(batch_id) or self.abandoned.get(batch_id)
+        if batch is None:
+            # Finished by another worker
+            return web.json_response({'accepted': False})
+        if worker not in batch.holders:
+            logger.warning(f"Rejected result for batch {batch_id} from {worker}, which never leased it")
+            return web.Response(status=403)
+
+        # Removed before the first await, so a concurrent result for the same batch is turned away
+        self.batches.pop(batch_id, None)
+        if self.abandoned.pop(batch_id, None) is not None:
+            self.failed -= 1
+            logger.info(f"Accepted a late result for batch {batch_id} from {worker} after giving it up")
+        elif batch.worker != worker:
+            logger.info(f"Accepted a late result for batch {batch_id} from {worker}, whose lease had expired")
+
+        items = []
+        for row in data.get('valid', []):
+            try:
+                items.append((decode_proxy(row[:6]), ProxyTiming(*row[6:9])))
+            except (ValueError, TypeError) as e:
+                logger.debug(f"Skipping malformed result {row} from {worker}: {e}")
+        logger.debug(f"Batch {batch.id} done by {worker}: {len(items)}/{len(batch.proxies)} valid")
+        self.completed += 1
+        # Blocks the worker's request while the pipeline is behind
+        await self.results.put(items)
+        await self._check_finished()
+        return web.json_response({'accepted': True})
+
+    async def _check_finished(self):
+        if self._source is None and not self.batches and not self.finished:
+            self.finished = True
+            # Nothing reads the results after DONE
+            self.abandoned.clear()
+            await self.results.put(DONE)
+
+    async def _reap(self):
+        while True:
+            await asyncio.sleep(min(self.lease_timeout / 4, 5))
+            now = time.monotonic()
+            for batch in list(self.batches.values()):
+                if batch.worker is None or batch.expires_at > now:
+                    continue
+                if batch.attempts >= self.max_attempts:
+                    logger.error(
+                        f"Giving up batch {batch.id} of {len(batch.proxies)} proxies "
+                        f"after {batch.attempts} expired leases"
+                    )
+                    self.abandoned[batch.id] = self.batches.pop(batch.id)
+                    self.failed += 1
+                    await self._check_finished()
+                    continue
+                logger.warning(f"Lease of batch {batch.id} held by {batch.worker} expired, queueing it again")
+                batch.worker = None
+                self.pending.append(batch.id)
+
+    async def _release_workers(self):
+        # Keep answering 410 for a moment so that polling workers learn that they can stop
+        deadline = time.monotonic() + POLL_INTERVAL * 2
+        while self.workers - self.released and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+
+
+class ValidationWorker:
+    """Pulls batches from a Coordinator, validates them and sends back the valid proxies.
+
+    While a batch is being checked its lease is renewed every third of the lease timeout.
+    Failed requests to the coordinator are retried with exponential backoff; the worker
+    stops when the coordinator answers 410 Gone or stays unreachable for ``retries``
+    attempts.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        name: Optional[str] = None,
+        validator: Optional[ProxyValidator] = None,
+        retries: int = REQUEST_RETRIES,
+        token: Optional[str] = TOKEN,
+    ):
+        self.url = url.rstrip('/')
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.token = token
+        self.validator = validator or ProxyValidator()
+        self.retries = retries
+        self.batches = 0
+
+    async def run(self):
+        headers = {'Authorization': f"Bearer {self.token}"} if self.token else None
+        async with ClientSession(timeout=ClientTimeout(total=REQUEST_TIMEOUT), headers=headers) as session:
+            while True:
+                status, lease = await self._post(session, '/lease')
+                if status == 410:
+                    break
+                if status == 204:
+                    await asyncio.sleep(POLL_INTERVAL)
+                    continue
+                if status != 200:
+                    logger.error(f"Coordinator {self.url} answered {status} to a lease request, stopping")
+                    break
+                await self._validate_batch(session, lease)
+        logger.info(f"Worker {self.name} finished after {self.batches} batches")
+
+    async def _validate_batch(self, session: ClientSession, lease: dict):
+        batch_id = lease['batch_id']
+        proxies = ProxyBatch()
+        for row in lease['proxies']:
+            proxies.append(decode_proxy(row))
+
+        renewer = asyncio.create_task(self._renew(session, batch_id, lease['lease_timeout'] / 3))
+        try:
+            valid = await self.validator.validate_proxies(proxies)
+        finally:
+            renewer.cancel()
+            await asyncio.gather(renewer, return_exceptions=True)
+
+        rows = [
+            encode_proxy(proxy) + list(valid.timings.get(row, (None, None, None)))
+            for row, proxy in enumerate(valid)
+        ]
+        await self._post(session, f'/results/{batch_id}', {'valid': rows})
+        self.batches += 1
+
+    async def _renew(self, session: ClientSession, batch_id: int, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            status, _ = await self._post(session, f'/renew/{batch_id}')
+            if status == 409:
+                logger.warning(f"Lease of batch {batch_id} was lost, finishing it anyway")
+                return
+
+    async def _post(
+        self, session: ClientSession, path: str, payload: Optional[dict] = None
+    ) -> Tuple[int, Optional[dict]]:
+        payload = dict(payload or {}, worker=self.name)
+        for attempt in range(self.retries):
+            try:
+                async with session.post(self.url + path, json=payload) as response:
+                    if response.status >= 500:
+                        raise ClientError(f"HTTP {response.status}")
+                    data = await response.json() if response.status == 200 else None
+                    return response.status, data
+            except (ClientError, asyncio.TimeoutError) as e:
+                delay = min(2 ** attempt, 30)
+                logger.warning(f"Request to coordinator {path} failed ({e}), retrying in {delay}s")
+                await asyncio.sleep(delay)
+        raise ConnectionError(f"Coordinator {self.url} unreachable after {self.retries} attempts")
+
+
+def start_local_workers(url: str, count: int, token: Optional[str] = TOKEN) -> List:
+    """Start ``count`` worker processes on this host, e.g. to run coordinator and workers on one box."""
+    context = multiprocessing.get_context('spawn')
+    processes = [
+        context.Process(
+            target=run_worker, args=(url, logging.getLogger().level, token), name=f'worker-{index}', daemon=True
+        )
+        for index in range(count)
+    ]
+    for process in processes:
+        process.start()
+    return processes
+
+
+def run_worker(url: str, log_level: int = logging.INFO, token: Optional[str] = TOKEN):
+    logging.basicConfig(level=log_level, format='%(asctime)s - %(processName)s - %(levelname)s - %(message)s')
+    asyncio.run(ValidationWorker(url, token=token).run())
@@ -1,12 +1,17 @@
 import abc
 import asyncio
 import logging
+from functools import partial
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
 
-from playwright.async_api import async_playwright
-
+from proxy_scraper.browser_pool import browser_pool
 from proxy_scraper.config import CONFIG
-from proxy_scraper.proxy_validator import ProxyValidator
-from proxy_scraper.proxy_writer import ProxyWriter
+from proxy_scraper.extractors.table import TableCell, scan_table_rows
+from proxy_scraper.fetch_strategy import BROWSER, HTTP, fetch_strategies
+from proxy_scraper.http_client import http_client
+from proxy_scraper.pipeline import Emit, ProxyPipeline
+from proxy_scraper.proxy import Proxy
 
 logger = logging.getLogger(__name__)
 
@@ -14,59 +19,112 @@ PROXY_DIR = CONFIG['proxy_dir']
 TIMEOUT = CONFIG['timeout']
 
 class ProxyScraperBase(abc.ABC):
-    def __init__(self):
-        self.writer = ProxyWriter()
-        self.validator = ProxyValidator()
+    # CSS selector the browser waits for; it must match the rows scan_table_rows collects
+    row_selector = "table tbody tr"
+    # None tries a plain GET first and falls back to the browser; HTTP or BROWSER forces one
+    fetch_strategy: Optional[str] = None
+    # Index of each field in a table row: 'ip' and 'port', or 'address' for ip:port in one cell,
+    # plus an optional 'protocol'. Rows with fewer than min_columns cells are skipped.
+    columns: Dict[str, int] = {}
+    min_columns = 0
+    default_protocol = 'http'
+    protocol_aliases: Dict[str, str] = {}
 
     @abc.abstractmethod
     def get_urls(self):
         pass
 
-    @abc.abstractmethod
-    def extract_proxies(self, content):
-        pass
-
-    async def fetch_page_content(self, url):
-        async with async_playwright() as playwright:
-            browser = await playwright.chromium.launch(headless=True)
-            context = await browser.new_context()
-            await context.add_init_script("Object.defineProperties(navigator, {webdriver:{get:()=>false}});")
-            page = await context.new_page()
-
-            async def handle(route, request):
-                if route.request.resource_type in ["stylesheet", "image", "media", "font"]:
-                    await route.abort()
-                else:
-                    await route.continue_()
-
-            await page.route("**/*", handle)
-
+    def extract_proxies(self, content: str) -> List[Proxy]:
+        if not content:
+            return []
+        return self.proxies_from_rows(scan_table_rows(content))
+
+    def proxies_from_rows(self, rows: List[List[TableCell]]) -> List[Proxy]:
+        proxies = []
+        logger.debug("Parsing table rows to extract proxies...")
+        for cells in rows:
+            if len(cells) < self.min_columns:
+                continue
+            proxy = self.build_proxy(cells)
+            if proxy:
+                proxies.append(proxy)
+                logger.debug(f"Extracted proxy: {proxy}")
+
+        return proxies
+
+    def build_proxy(self, cells: List[TableCell]) -> Optional[Proxy]:
+        fields = {name: cells[index].text.strip() for name, index in self.columns.items() if index < len(cells)}
+        if 'address' in fields:
+            ip, _, port = fields['address'].partition(':')
+        else:
+            ip, port = fields.get('ip'), fields.get('port')
+        try:
+            return Proxy(ip, port, self.get_protocol(fields.get('protocol'), cells))
+        except ValueError as e:
+            logger.debug(f"Skipping malformed row {[cell.text for cell in cells]}: {e}")
+            return None
+
+    def get_protocol(self, value: Optional[str], cells: List[TableCell]) -> str:
+        if not value:
+            return self.default_protocol
+        protocol = value.lower()
+        return self.protocol_aliases.get(protocol, protocol)
+
+    async def fetch_page_rows(self, url) -> List[List[TableCell]]:
+        """Table rows of the page at ``url``. Every page is scanned once, however it was fetched."""
+        source = urlsplit(url).netloc
+        strategy = self.fetch_strategy or fetch_strategies.get(source)
+
+        if strategy != BROWSER:
+            logger.info(f"Fetching static page content from {url}")
+            content = await http_client.fetch_text(url)
+            rows = scan_table_rows(content) if content else []
+            if rows:
+                fetch_strategies.set(source, HTTP)
+                return rows
+            if self.fetch_strategy == HTTP:
+                return []
+            if not content:
+                # A failed GET says nothing about the page, so nothing is recorded for the source
+                logger.info(f"Static fetch of {url} failed, falling back to browser")
+                return await self.fetch_rendered_rows(url)
+            logger.info(f"No table rows in static content from {url}, falling back to browser")
+
+        rows = await self.fetch_rendered_rows(url)
+        if rows and strategy != BROWSER:
+            # Only a page that loaded without rows is known to need the browser
+            fetch_strategies.set(source, BROWSER)
+        return rows
+
+    async def fetch_rendered_rows(self, url) -> List[List[TableCell]]:
+        content = await self.fetch_rendered_content(url)
+        return scan_table_rows(content) if content else []
+
+    async def fetch_rendered_content(self, url):
+        async with browser_pool.page() as page:
             try:
                 logger.info(f"Fetching page content from {url}")
                 await page.goto(url, wait_until="domcontentloaded")
 
                 logger.info("Waiting for table rows to load...")
-                await page.wait_for_selector("table tbody tr", timeout=TIMEOUT*1000)
+                await page.wait_for_selector(self.row_selector, timeout=TIMEOUT*1000)
 
                 content = await page.content()
                 logger.debug("Page content fetched successfully.")
             except Exception as e:
                 logger.error(f"Error during request: {e}")
                 content = None
-            finally:
-                await browser.close()
-                await playwright.stop()
 
             return content
 
-    async def fetch_and_process(self, url):
-        content = await self.fetch_page_content(url)
-        if content:
-            proxies = self.extract_proxies(content)
-            valid_proxies = await self.validator.validate_proxies(proxies)
-            self.writer.save_raw_proxies(valid_proxies)
+    async def fetch(self, emit: Emit):
+        """Fetch stage of the pipeline: hand the table rows of every page to ``emit`` as a parse job."""
+        async def fetch_url(url):
+            rows = await self.fetch_page_rows(url)
+            if rows:
+                await emit(partial(self.proxies_from_rows, rows))
+
+        await asyncio.gather(*(fetch_url(url) for url in self.get_urls()))
 
     async def scrape(self):
-        urls = self.get_urls()
-        tasks = [self.fetch_and_process(url) for url in urls]
-        await asyncio.gather(*tasks)
+        await ProxyPipeline().scrape([self])
@@ -0,0 +1,78 @@
+from html.parser import HTMLParser
+from typing import FrozenSet, List, NamedTuple, Optional
+
+
+class TableCell(NamedTuple):
+    text: str
+    # Classes of every element nested inside the cell, for sources that encode values as icons
+    classes: FrozenSet[str]
+
+
+class TableRowScanner(HTMLParser):
+    """Collects the <td> cells of every row under ``table tbody`` without building a document tree.
+
+    Tags are handled as they stream past, so ``feed`` can be called with chunks of a page.
+    Cells and rows whose end tags were omitted are closed by the next cell, row or tbody.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows: List[List[TableCell]] = []
+        self._table_depth = 0
+        self._tbody_depth = 0
+        self._row: Optional[List[TableCell]] = None
+        self._cell_text: Optional[List[str]] = None
+        self._cell_classes: Optional[set] = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'table':
+            self._table_depth += 1
+        elif tag == 'tbody' and self._table_depth:
+            self._tbody_depth += 1
+        elif tag == 'tr' and self._tbody_depth:
+            self._close_row()
+            self._row = []
+        elif tag == 'td' and self._row is not None:
+            self._close_cell()
+            self._cell_text = []
+            self._cell_classes = set()
+        elif self._cell_classes is not None:
+            for name, value in attrs:
+                if name == 'class' and value:
+                    self._cell_classes.update(value.split())
+
+    def handle_endtag(self, tag):
+        if tag == 'td':
+            self._close_cell()
+        elif tag == 'tr':
+            self._close_row()
+        elif tag == 'tbody' and self._tbody_depth:
+            self._close_row()
+            self._tbody_depth -= 1
+        elif tag == 'table' and self._table_depth:
+            self._close_row()
+            self._table_depth -= 1
+
+    def handle_data(self, data):
+        if self._cell_text is not None:
+            self._cell_text.append(data)
+
+    def _close_cell(self):
+        if self._cell_text is not None:
+            self._row.append(TableCell(''.join(self._cell_text), frozenset(self._cell_classes)))
+            self._cell_text = None
+            self._cell_classes = None
+
+    def _close_row(self):
+        self._close_cell()
+        if self._row:
+            self.rows.append(self._row)
+        self._row = None
+
+
+def scan_table_rows(content: str) -> List[List[TableCell]]:
+    scanner = TableRowScanner()
+    scanner.feed(content)
+    scanner.close()
+    scanner._close_row()
+    return scanner.rows
@@ -1,22 +1,28 @@
+import asyncio
 import logging
-import re
-from typing import Dict, List
+from functools import partial
+from typing import Dict, List, Optional
 
-import aiohttp
+from aiohttp import ClientError, ClientTimeout
 
 from proxy_scraper.config import CONFIG
 from proxy_scraper.extractors.base import ProxyScraperBase
+from proxy_scraper.http_client import http_client
+from proxy_scraper.parser import iter_records
+from proxy_scraper.pipeline import Emit
 from proxy_scraper.proxy import Proxy
 
 logger = logging.getLogger(__name__)
 
 PROXY_DIR = CONFIG["proxy_dir"]
+TIMEOUT = CONFIG["timeout"]
+# Lines handed to the parse stage at a time
+CHUNK_LINES = 1000
+# Large lists may take longer than the total timeout to stream, so only bound the individual reads
+STREAM_TIMEOUT = ClientTimeout(total=None, sock_connect=TIMEOUT, sock_read=TIMEOUT)
 
 
 class TxtProxyScraper(ProxyScraperBase):
-    def __init__(self):
-        super().__init__()
-
     def get_urls(self) -> Dict[str, List[str]]:
         return {
             "http": [
@@ -52,35 +58,42 @@ class TxtProxyScraper(ProxyScraperBase):
             ]
         }
 
-    async def scrape(self):
-        urls_by_type = self.get_urls()
-        unique_proxies_by_type = {proxy_type: set() for proxy_type in urls_by_type.keys()}
-
-        for proxy_type, urls in urls_by_type.items():
-            for url in urls:
-                logger.info(f"Scraping {proxy_type} proxies from {url}...")
-                content = await self.fetch_content(url)
-                if content:
-                    proxies = self.extract_proxies(content, proxy_type)
-                    unique_proxies_by_type[proxy_type].update(proxies)
+    async def fetch(self, emit: Emit):
+        await asyncio.gather(*(
+            self.stream_proxies(url, proxy_type, emit)
+            for proxy_type, urls in self.get_urls().items()
+            for url in urls
+        ))
 
-        for proxy_type, proxies in unique_proxies_by_type.items():
-            if proxies:
-                valid_proxies = await self.validator.validate_proxies(list(proxies))
-                self.writer.save_raw_proxies(valid_proxies)
+    async def stream_proxies(self, url: str, proxy_type: str, emit: Emit):
+        """Download a list line by line, emitting parse jobs for every chunk of lines as it arrives."""
+        logger.info(f"Scraping {proxy_type} proxies from {url}...")
+        session = await http_client.get_session()
+        count = 0
+        try:
+            async with session.get(url, timeout=STREAM_TIMEOUT) as response:
+                response.raise_for_status()
+                lines = []
+                async for line in response.content:
+                    lines.append(line.decode('utf-8', errors='ignore'))
+                    if len(lines) >= CHUNK_LINES:
+                        count += len(lines)
+                        await emit(partial(self.extract_lines, lines, proxy_type))
+                        lines = []
+                if lines:
+                    count += len(lines)
+                    await emit(partial(self.extract_lines, lines, proxy_type))
+        except (ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.error(f"Error scraping {proxy_type} proxies from {url}: {e}")
+        logger.info(f"Read {count} lines of {proxy_type} proxies from {url}")
 
-    async def fetch_content(self, url: str) -> str:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                return await response.text()
+    def extract_lines(self, lines: List[str], proxy_type: str) -> List[Proxy]:
+        proxies = (self._to_proxy(record, proxy_type) for record in iter_records(lines))
+        return [proxy for proxy in proxies if proxy]
 
-    def extract_proxies(self, content: str, proxy_type: str) -> List[Proxy]:
-        proxies = []
-        if content:
-            lines = content.strip().split("\n")
-            for line in lines:
-                ip_port = line.strip()
-                if re.match(r'^(\d{1,3}\.){3}\d{1,3}:\d+$', ip_port):
-                    ip, port = ip_port.split(":")
-                    proxies.append(Proxy(ip, port, proxy_type, ""))
-        return proxies
+    def _to_proxy(self, record, proxy_type: str) -> Optional[Proxy]:
+        try:
+            return Proxy.from_record(record, proxy_type)
+        except ValueError as e:
+            logger.debug(f"Skipping malformed proxy {record}: {e}")
+            return None
@@ -0,0 +1,53 @@
+import json
+import logging
+import os
+from typing import Dict, Optional
+
+from proxy_scraper.config import CONFIG
+from proxy_scraper.util.aio import io_thread
+
+logger = logging.getLogger(__name__)
+
+CACHE_PATH = CONFIG.get('fetch_strategy_cache', 'fetch_strategy.json')
+
+HTTP = 'http'
+BROWSER = 'browser'
+
+
+class FetchStrategyCache:
+    """Remembers, per source host, whether a plain GET was enough or the page needed a browser."""
+
+    def __init__(self, path: str = CACHE_PATH):
+        self.path = path
+        self._strategies: Dict[str, str] = self._load()
+
+    def _load(self) -> Dict[str, str]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error reading fetch strategy cache {self.path}: {e}")
+            return {}
+
+    def get(self, source: str) -> Optional[str]:
+        return self._strategies.get(source)
+
+    def set(self, source: str, strategy: str):
+        if self._strategies.get(source) == strategy:
+            return
+        self._strategies[source] = strategy
+        logger.info(f"Using {strategy} fetch strategy for {source}")
+        # Called from scraper coroutines, so the file is written on the I/O thread
+        io_thread.submit(self._save, dict(self._strategies))
+
+    def _save(self, strategies: Dict[str, str]):
+        try:
+            with open(self.path, 'w') as f:
+                json.dump(strategies, f, indent=2, sort_keys=True)
+        except OSError as e:
+            logger.error(f"Error writing fetch strategy cache {self.path}: {e}")
+
+
+fetch_strategies = FetchStrategyCache()
@@ -0,0 +1,53 @@
+import asyncio
+import logging
+from typing import Optional
+
+from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector
+
+from proxy_scraper.config import CONFIG
+from proxy_scraper.transport import get_ssl_context, load_headers
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT = CONFIG['timeout']
+HTTP_CONFIG = CONFIG.get('http', {})
+LIMIT = HTTP_CONFIG.get('limit', 50)
+LIMIT_PER_HOST = HTTP_CONFIG.get('limit_per_host', 4)
+
+
+class HttpClient:
+    """Pooled aiohttp session used by the scrapers to download source pages and lists."""
+
+    def __init__(self, limit: int = LIMIT, limit_per_host: int = LIMIT_PER_HOST, timeout: int = TIMEOUT):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = ClientTimeout(total=timeout)
+        self._session: Optional[ClientSession] = None
+        self._lock = asyncio.Lock()
+
+    async def get_session(self) -> ClientSession:
+        async with self._lock:
+            if self._session is None or self._session.closed:
+                headers = await load_headers()
+                connector = TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host, ssl=get_ssl_context())
+                self._session = ClientSession(connector=connector, headers=headers, timeout=self.timeout)
+            return self._session
+
+    async def fetch_text(self, url: str) -> Optional[str]:
+        session = await self.get_session()
+        try:
+            async with session.get(url) as response:
+                response.raise_for_status()
+                return await response.text()
+        except (ClientError, asyncio.TimeoutError, UnicodeDecodeError) as e:
+            logger.error(f"Error fetching {url}: {e}")
+            return None
+
+    async def close(self):
+        async with self._lock:
+            if self._session is not None:
+                await self._session.close()
+                self._session = None
+
+
+http_client = HttpClient()
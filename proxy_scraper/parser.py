@@ -0,0 +1,63 @@
+import re
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+# ip:port, optionally prefixed by proto:// and user:pass@, optionally followed by columns such as a country code.
+# Possessive quantifiers keep a failed optional prefix from backtracking through the rest of the line.
+# ASCII, so \d and \s mean what they do in the lists, and digits other than 0-9 never make a port.
+LINE_PATTERN = re.compile(
+    r'^[ \t]*+(?:(https?|socks[45])://)?+(?:([^:@\s]++):([^@\s]*+)@)?+'
+    r'((?:\d{1,3}\.){3}\d{1,3}):(\d{1,5})(?![^\s,;|])'
+    r'(?:[ \t,;|]++([A-Za-z]{2})\b)?+[^\S\n]*+(?:\S[^\n]*)?$',
+    re.IGNORECASE | re.MULTILINE | re.ASCII,
+)
+
+# Plain ip:port lines, the bulk of most lists, skip LINE_PATTERN: they are split on ':' and
+# only the host is matched against this
+_match_ip = re.compile(r'(?:\d{1,3}\.){3}\d{1,3}', re.ASCII).fullmatch
+
+
+class ProxyRecord(NamedTuple):
+    host: str
+    port: int
+    protocol: Optional[str]
+    username: Optional[str]
+    password: Optional[str]
+    country: Optional[str]
+
+
+# NamedTuple.__new__ is a Python-level function; building the tuple directly skips that call per line
+_new_record = tuple.__new__
+
+
+def _to_record(match: re.Match) -> Optional[ProxyRecord]:
+    protocol, username, password, host, port, country = match.groups()
+    port = int(port)
+    if not 0 < port < 65536:
+        return None
+    return _new_record(ProxyRecord, (
+        host,
+        port,
+        protocol.lower() if protocol else None,
+        username,
+        password,
+        country.upper() if country else None,
+    ))
+
+
+def iter_records(lines: Iterable[str]) -> Iterator[ProxyRecord]:
+    match_ip = _match_ip
+    match_line = LINE_PATTERN.match
+    for line in lines:
+        # Fast path for bare ip:port lines; anything it does not take is left to LINE_PATTERN
+        host, _, port = line.strip(' \t\r\n').partition(':')
+        # isdigit and int() also take digits other than 0-9, which LINE_PATTERN rejects
+        if port.isdigit() and len(port) <= 5 and port.isascii() and match_ip(host):
+            port = int(port)
+            if 0 < port < 65536:
+                yield _new_record(ProxyRecord, (host, port, None, None, None, None))
+                continue
+        match = match_line(line.rstrip('\r\n'))
+        if match:
+            record = _to_record(match)
+            if record:
+                yield record
@@ -0,0 +1,275 @@
+import asyncio
+import logging
+import os
+import time
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from proxy_scraper.config import CONFIG
+from proxy_scraper.dedup import ProxyDeduplicator
+from proxy_scraper.proxy import Proxy, ProxyTiming
+from proxy_scraper.proxy_batch import ProxyBatch
+from proxy_scraper.proxy_validator import ProxyValidator
+from proxy_scraper.proxy_writer import ProxyWriter
+from proxy_scraper.util.aio import LoopLagMonitor
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_CONFIG = CONFIG.get('pipeline', {})
+QUEUE_SIZE = PIPELINE_CONFIG.get('queue_size', 1000)
+# Parse jobs hold whole pages, so only a few are buffered
+PARSE_QUEUE_SIZE = PIPELINE_CONFIG.get('parse_queue_size', 16)
+FLUSH_INTERVAL = PIPELINE_CONFIG.get('flush_interval', 5)
+FLUSH_SIZE = PIPELINE_CONFIG.get('flush_size', 500)
+# Skip scraped proxies that are already in the raw lists, using a Bloom filter of them
+SKIP_KNOWN = PIPELINE_CONFIG.get('skip_known', True)
+BLOOM_ERROR_RATE = PIPELINE_CONFIG.get('bloom_error_rate', 0.001)
+PROGRESS_INTERVAL = CONFIG.get('validator', {}).get('progress_interval', 5)
+# How often the event loop's wake-up lag is sampled, and the lag that is logged as a stall
+LOOP_LAG_INTERVAL = PIPELINE_CONFIG.get('loop_lag_interval', 0.1)
+LOOP_LAG_WARNING = PIPELINE_CONFIG.get('loop_lag_warning', 0.1)
+
+# A fetched page or chunk of lines, parsed by the parse stage
+ParseJob = Callable[[], Iterable[Proxy]]
+Emit = Callable[[ParseJob], Awaitable[None]]
+
+# Put on a queue by a stage once it will not produce anything else
+DONE = None
+
+
+class ProxyPipeline:
+    """Scraping and validation as stages that run concurrently, connected by bounded queues.
+
+        fetch -> parse -> dedup -> validate -> geo -> write
+
+    A stage blocks once the queue of the next one is full, so a slow validator holds the
+    downloads back instead of letting parsed proxies pile up in memory. Valid proxies
+    are collected into batches of ``flush_size`` or whatever arrived within
+    ``flush_interval`` seconds. While scraping, every batch is appended to the raw lists
+    right away on the I/O thread; validated proxies are collected and the lists are
+    replaced once, after the last batch.
+    ``depths()`` shows how many items are waiting in front of each stage and
+    ``loop_lag`` how late the event loop has been, which stays near zero as long as
+    nothing blocks it.
+    """
+
+    def __init__(
+        self,
+        validator: Optional[ProxyValidator] = None,
+        writer: Optional[ProxyWriter] = None,
+        queue_size: int = QUEUE_SIZE,
+        flush_interval: float = FLUSH_INTERVAL,
+        flush_size: int = FLUSH_SIZE,
+        skip_known: bool = SKIP_KNOWN,
+    ):
+        self.validator = validator or ProxyValidator()
+        self.writer = writer or ProxyWriter()
+        self.queue_size = queue_size
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.skip_known = skip_known
+        self.queues: Dict[str, asyncio.Queue] = {}
+        self.deduplicator = ProxyDeduplicator()
+        self.loop_lag = LoopLagMonitor(LOOP_LAG_INTERVAL, LOOP_LAG_WARNING)
+        self.written = 0
+        # Set once GeoLite2 is loaded; until then the per-country lists on disk are left alone
+        self.countries_complete = False
+
+    def depths(self) -> Dict[str, int]:
+        return {name: queue.qsize() for name, queue in self.queues.items()}
+
+    async def scrape(self, scrapers: List) -> int:
+        """Fetch, validate and append valid proxies to the raw lists. Returns how many were written.
+
+        With ``skip_known``, proxies already in the raw lists are not validated again.
+        Afterwards the raw lists with too many stale lines are compacted.
+        """
+        self._reset()
+        if self.skip_known:
+            raw_directory = os.path.join(self.writer.directory, 'raw')
+            self.deduplicator = await asyncio.to_thread(
+                ProxyDeduplicator.from_raw_directory, raw_directory, BLOOM_ERROR_RATE
+            )
+        parse = self._queue('parse', PARSE_QUEUE_SIZE)
+        dedup = self._queue('dedup')
+        validate = self._queue('validate')
+        collect = self._queue('geo')
+        write = self._queue('write')
+        await self._run(
+            self._fetch(scrapers, parse),
+            self._parse(parse, dedup),
+            self._dedup(dedup, validate),
+            self._validate(validate, collect, None),
+            self._collect(collect, write, resolve_countries=False),
+            self._write(write, self.writer.save_raw_proxies_async),
+        )
+        await self.writer.compact_raw_proxies_async()
+        return self.written
+
+    async def validate(
+        self, proxies: Union[Iterable[Proxy], AsyncIterable[Proxy]], total: Optional[int] = None
+    ) -> ProxyBatch:
+        """Validate proxies, resolve their countries and replace the proxy lists on disk.
+
+        Returns every valid proxy. The lists are written once all proxies are checked, so a
+        run that fails half way leaves the published lists as they were. ``total``, the
+        expected number of proxies, lets the progress log show an ETA for streamed input.
+        """
+        self._reset()
+        dedup = self._queue('dedup')
+        validate = self._queue('validate')
+        collect = self._queue('geo')
+        write = self._queue('write')
+        valid_proxies = ProxyBatch()
+        await self._run(
+            self._read(proxies, dedup),
+            self._dedup(dedup, validate),
+            self._validate(validate, collect, total),
+            self._collect(collect, write, resolve_countries=True),
+            self._write(write, self._keep(valid_proxies)),
+        )
+        await self.writer.save_lists_async(valid_proxies, country_lists=self.countries_complete)
+        return valid_proxies
+
+    async def save_valid(self, results: AsyncIterable[Tuple[Proxy, ProxyTiming]]) -> ProxyBatch:
+        """Like validate, for proxies that were checked elsewhere, e.g. by worker processes.
+
+        ``results`` yields every valid proxy with its timing; they are not deduplicated.
+        """
+        self._reset()
+        collect = self._queue('geo')
+        write = self._queue('write')
+        valid_proxies = ProxyBatch()
+        await self._run(
+            self._read(results, collect),
+            self._collect(collect, write, resolve_countries=True),
+            self._write(write, self._keep(valid_proxies)),
+        )
+        await self.writer.save_lists_async(valid_proxies, country_lists=self.countries_complete)
+        return valid_proxies
+
+    def _keep(self, valid_proxies: ProxyBatch) -> Callable[[ProxyBatch], Awaitable]:
+        # Ranking needs every proxy, so the lists are only written from the complete batch
+        async def keep(batch: ProxyBatch):
+            valid_proxies.extend(batch)
+
+        return keep
+
+    def _reset(self):
+        self.queues = {}
+        self.deduplicator = ProxyDeduplicator()
+        self.loop_lag = LoopLagMonitor(LOOP_LAG_INTERVAL, LOOP_LAG_WARNING)
+        self.written = 0
+        self.countries_complete = False
+
+    def _queue(self, name: str, maxsize: Optional[int] = None) -> asyncio.Queue:
+        self.queues[name] = asyncio.Queue(maxsize=self.queue_size if maxsize is None else maxsize)
+        return self.queues[name]
+
+    async def _run(self, *stages: Awaitable):
+        tasks = [asyncio.create_task(stage) for stage in stages]
+        monitors = [asyncio.create_task(self._report_depths()), asyncio.create_task(self.loop_lag.run())]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks + monitors:
+                task.cancel()
+            await asyncio.gather(*tasks, *monitors, return_exceptions=True)
+        logger.info(
+            f"Pipeline finished: {self.written} valid proxies, {self.deduplicator.duplicates} duplicates "
+            f"and {self.deduplicator.known} already known proxies dropped, event loop lag {self.loop_lag}"
+        )
+
+    async def _report_depths(self):
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            depths = ', '.join(f"{name} {depth}" for name, depth in self.depths().items())
+            logger.info(f"Pipeline queue depths: {depths}; event loop lag {self.loop_lag}")
+
+    async def _drain(self, queue: asyncio.Queue) -> AsyncIterator:
+        while (item := await queue.get()) is not DONE:
+            yield item
+
+    async def _fetch(self, scrapers: List, output: asyncio.Queue):
+        async def fetch(scraper):
+            try:
+                await scraper.fetch(output.put)
+            except Exception as e:
+                logger.error(f"Error scraping with {type(scraper).__name__}: {e}")
+
+        try:
+            await asyncio.gather(*(fetch(scraper) for scraper in scrapers))
+        finally:
+            await output.put(DONE)
+
+    async def _parse(self, source: asyncio.Queue, output: asyncio.Queue):
+        async for job in self._drain(source):
+            try:
+                proxies = job()
+            except Exception as e:
+                logger.error(f"Error parsing scraped content: {e}")
+                continue
+            for proxy in proxies:
+                await output.put(proxy)
+        await output.put(DONE)
+
+    async def _read(self, proxies: Union[Iterable[Proxy], AsyncIterable[Proxy]], output: asyncio.Queue):
+        if hasattr(proxies, '__aiter__'):
+            async for proxy in proxies:
+                await output.put(proxy)
+        else:
+            for proxy in proxies:
+                await output.put(proxy)
+        await output.put(DONE)
+
+    async def _dedup(self, source: asyncio.Queue, output: asyncio.Queue):
+        is_new = self.deduplicator.is_new
+        async for proxy in self._drain(source):
+            if is_new(proxy):
+                await output.put(proxy)
+        await output.put(DONE)
+
+    async def _validate(self, source: asyncio.Queue, output: asyncio.Queue, total: Optional[int]):
+        async for item in self.validator.iter_valid(self._drain(source), total):
+            await output.put(item)
+        await output.put(DONE)
+
+    async def _collect(self, source: asyncio.Queue, output: asyncio.Queue, resolve_countries: bool):
+        # Opens the geo databases while the first proxies are being validated
+        geo_ready = asyncio.create_task(self._warm_up_geo()) if resolve_countries else None
+
+        finished = False
+        while not finished:
+            batch = ProxyBatch()
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.flush_size:
+                try:
+                    item = await asyncio.wait_for(source.get(), max(deadline - time.monotonic(), 0))
+                except asyncio.TimeoutError:
+                    break
+                if item is DONE:
+                    finished = True
+                    break
+                batch.append(*item)
+
+            if batch:
+                if geo_ready and await geo_ready:
+                    await batch.resolve_countries()
+                await output.put(batch)
+        await output.put(DONE)
+
+    async def _warm_up_geo(self) -> bool:
+        from proxy_scraper.util.geo import geo_info
+
+        # Downloading GeoLite2 when it is missing must not block the event loop
+        try:
+            await asyncio.to_thread(geo_info.warm_up)
+        except Exception as e:
+            logger.error(f"Geo lookups unavailable, proxies will be saved without countries: {e}")
+            return False
+        self.countries_complete = geo_info.complete
+        return True
+
+    async def _write(self, source: asyncio.Queue, write: Callable[[ProxyBatch], Awaitable]):
+        async for batch in self._drain(source):
+            await write(batch)
+            self.written += len(batch)
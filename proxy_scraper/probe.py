@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import socket
+import struct
+from typing import Optional
+from urllib.parse import urlsplit
+
+from aiohttp import BasicAuth
+
+from proxy_scraper.config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+VALIDATOR_CONFIG = CONFIG.get('validator', {})
+PROBE_TIMEOUT = VALIDATOR_CONFIG.get('prefilter_timeout', 3)
+
+_validate_url = urlsplit(CONFIG['validate_url'])
+TARGET_HOST = _validate_url.hostname
+TARGET_PORT = _validate_url.port or (443 if _validate_url.scheme == 'https' else 80)
+
+# Packed IPv4 address of TARGET_HOST, set by resolve_target
+_target_address: Optional[bytes] = None
+
+
+async def resolve_target() -> bytes:
+    """Resolve TARGET_HOST to the IPv4 address sent in SOCKS4 requests.
+
+    The full check resolves the validate URL locally as well (aiohttp_socks with
+    rdns=False), so the probe asks the proxy for the same address it will be asked for.
+    Called once per validation run; probes reuse the result.
+    """
+    global _target_address
+    infos = await asyncio.get_running_loop().getaddrinfo(
+        TARGET_HOST, TARGET_PORT, family=socket.AF_INET, type=socket.SOCK_STREAM
+    )
+    _target_address = socket.inet_aton(infos[0][4][0])
+    return _target_address
+
+
+async def probe(proxy, timeout: float = PROBE_TIMEOUT) -> bool:
+    """Cheap liveness check: TCP connect plus the first step of the proxy handshake.
+
+    Returns False as soon as the proxy fails to accept the connection or does not
+    answer like a proxy of its declared protocol. It never fetches the validate URL,
+    so a True result only means the proxy is worth the full check.
+    """
+    writer = None
+    try:
+        async with asyncio.timeout(timeout):
+            reader, writer = await asyncio.open_connection(proxy.host, int(proxy.port))
+            return await _HANDSHAKES.get(proxy.protocol, _http_connect)(proxy, reader, writer)
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+        logger.debug(f"Probe failed for proxy {proxy}: {e!r}")
+        return False
+    finally:
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+
+async def _http_connect(proxy, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> bool:
+    target = f"{TARGET_HOST}:{TARGET_PORT}"
+    headers = f"Host: {target}\r\n"
+    if proxy.username:
+        headers += f"Proxy-Authorization: {BasicAuth(proxy.username, proxy.password or '').encode()}\r\n"
+    writer.write(f"CONNECT {target} HTTP/1.1\r\n{headers}\r\n".encode())
+    await writer.drain()
+    status_line = await reader.readline()
+    parts = status_line.split(None, 2)
+    return len(parts) >= 2 and parts[0].startswith(b'HTTP/') and parts[1].startswith(b'2')
+
+
+async def _socks4_greeting(proxy, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> bool:
+    address = _target_address or await resolve_target()
+    user_id = (proxy.username or '').encode()
+    writer.write(struct.pack('>BBH4s', 4, 1, TARGET_PORT, address) + user_id + b'\x00')
+    await writer.drain()
+    reply = await reader.readexactly(8)
+    return reply[0] == 0 and reply[1] == 0x5A
+
+
+async def _socks5_greeting(proxy, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> bool:
+    methods = b'\x00\x02' if proxy.username else b'\x00'
+    writer.write(bytes([5, len(methods)]) + methods)
+    await writer.drain()
+    reply = await reader.readexactly(2)
+    return reply[0] == 5 and reply[1] != 0xFF
+
+
+_HANDSHAKES = {
+    'http': _http_connect,
+    'https': _http_connect,
+    'socks4': _socks4_greeting,
+    'socks5': _socks5_greeting,
+}
@@ -1,7 +1,7 @@
-from enum import Enum
+from enum import StrEnum
 
 
-class Protocol(Enum):
+class Protocol(StrEnum):
     HTTP = 'http'
     HTTPS = 'https'
     SOCKS4 = 'socks4'
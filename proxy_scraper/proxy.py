@@ -1,84 +1,170 @@
 
 import logging
-import ssl
-from typing import Optional
+import socket
+import struct
+import time
+from typing import TYPE_CHECKING, NamedTuple, Optional, Union
 
-import certifi
-from aiohttp import ClientError, ClientSession
-from aiohttp_socks import ProxyConnector, ProxyType
-from fake_useragent import UserAgent
-
-from proxy_scraper.config import CONFIG
 from proxy_scraper.protocol import Protocol
-from proxy_scraper.util.geo import geo_info
 
-SSL_CONTEXT = ssl.create_default_context(cafile=certifi.where())
+if TYPE_CHECKING:
+    from proxy_scraper.transport import ValidationTransport
+
+logger = logging.getLogger(__name__)
 
-VALIDATE_URL = CONFIG['validate_url']
-TIMEOUT = CONFIG['timeout']
 
+def ip_to_int(host: str) -> int:
+    try:
+        return struct.unpack('!I', socket.inet_pton(socket.AF_INET, host))[0]
+    except (OSError, TypeError):
+        raise ValueError(f"Invalid IPv4 address: {host!r}")
 
-ua = UserAgent()
 
-headers = {
-    'User-Agent': ua.random
-}
+def int_to_ip(ip: int) -> str:
+    return socket.inet_ntoa(struct.pack('!I', ip))
+
+
+class ProxyTiming(NamedTuple):
+    """Seconds taken by a successful check, measured from the start of the request."""
+
+    # Until the connection through the proxy was ready: TCP connect, proxy handshake and TLS
+    connect: float
+    # Until the response headers arrived
+    ttfb: float
+    # Until the whole response was read
+    total: float
 
-logger = logging.getLogger(__name__)
 
 class Proxy:
-    def __init__(self, host: str, port: int, protocol: Protocol, username: Optional[str] = None, password: Optional[str] = None, country:Optional[str] = None):
-        self.host = host
-        self.port = port
-        self.protocol = protocol
-        self.username = username
-        self.password = password
-        self.country = country
+    """A proxy endpoint, identified by its IPv4 address, port and protocol.
+
+    The address is kept packed as an int and the protocol as a Protocol member, and
+    instances have no __dict__, so hundreds of thousands of them stay cheap. Two
+    proxies are equal when ip, port and protocol match; credentials and country are
+    not part of the identity. Raises ValueError for a malformed host, port or protocol.
+    """
+
+    __slots__ = ('ip', 'port', 'protocol', 'username', 'password', 'country')
+
+    def __init__(
+        self,
+        host: str,
+        port: Union[int, str],
+        protocol: Union[Protocol, str],
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        country: Optional[str] = None,
+    ):
+        self.ip = ip_to_int(host)
+        self.port = int(port)
+        if not 0 < self.port < 65536:
+            raise ValueError(f"Invalid port: {port!r}")
+        self.protocol = Protocol(protocol)
+        self.username = username or None
+        self.password = password or None
+        self.country = country or None
+
+    @classmethod
+    def from_record(cls, record, protocol: Union[Protocol, str]) -> 'Proxy':
+        """Build a proxy from a parser.ProxyRecord, using ``protocol`` when the line did not name one."""
+        return cls(
+            record.host,
+            record.port,
+            record.protocol or protocol,
+            username=record.username,
+            password=record.password,
+            country=record.country,
+        )
+
+    @classmethod
+    def from_packed(
+        cls,
+        ip: int,
+        port: int,
+        protocol: Protocol,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        country: Optional[str] = None,
+    ) -> 'Proxy':
+        """Rebuild a proxy from already validated fields, as stored by ProxyBatch."""
+        proxy = cls.__new__(cls)
+        proxy.ip = ip
+        proxy.port = port
+        proxy.protocol = protocol
+        proxy.username = username
+        proxy.password = password
+        proxy.country = country
+        return proxy
+
+    @property
+    def host(self) -> str:
+        return int_to_ip(self.ip)
+
+    def __eq__(self, other):
+        if not isinstance(other, Proxy):
+            return NotImplemented
+        return self.ip == other.ip and self.port == other.port and self.protocol is other.protocol
+
+    def __hash__(self):
+        return hash((self.ip, self.port, self.protocol))
 
     def __str__(self):
         return f"{self.protocol}://{self.host}:{self.port}"
 
+    def __repr__(self):
+        return f"Proxy({self.host!r}, {self.port}, {self.protocol.value!r})"
+
     def get_address(self):
         return f"{self.host}:{self.port}"
 
-    async def is_valid(self) -> bool:
-        logger.debug(f"Creating ProxyConnector for proxy: {self}")
+    async def is_valid(self, transport: Optional['ValidationTransport'] = None) -> bool:
+        return await self.check(transport) is not None
 
-        connector = ProxyConnector(
-            proxy_type=ProxyType.__dict__[self.protocol.upper().upper().rstrip("S")],
-            host=self.host,
-            port=self.port,
-            username=self.username,
-            password=self.password,
-            ssl=SSL_CONTEXT
-        )
+    async def check(self, transport: Optional['ValidationTransport'] = None) -> Optional[ProxyTiming]:
+        """Validate the proxy, returning how long the check took, or None if it failed."""
+        # Imported here so that code which only handles Proxy values never loads aiohttp
+        from aiohttp import ClientError
 
+        from proxy_scraper.transport import ValidationTransport
+
+        if transport is None:
+            async with ValidationTransport() as transport:
+                return await self.check(transport)
+
+        trace = {}
         try:
-            async with ClientSession(connector=connector, headers=headers, raise_for_status=True) as session:
-                async with session.get(VALIDATE_URL, timeout=TIMEOUT) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        origin = data.get('origin')
-                        if origin and self.host == origin:
-                            logger.debug(f"Proxy {self} is valid.")
-                            return True
-                    logger.debug(f"Proxy {self} is invalid.")
+            async with transport.request(self, trace=trace) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    finished = time.perf_counter()
+                    origin = data.get('origin')
+                    if origin and self.host == origin:
+                        logger.debug(f"Proxy {self} is valid.")
+                        started = trace.get('started', finished)
+                        return ProxyTiming(
+                            connect=trace.get('connected', started) - started,
+                            ttfb=trace.get('first_byte', finished) - started,
+                            total=finished - started,
+                        )
+                logger.debug(f"Proxy {self} is invalid.")
         except ClientError as e:
             logger.debug(f"Network error while validating proxy {self}: {e}")
         except Exception as e:
             logger.debug(f"Error validating proxy {self}: {e}")
-        return False
+        return None
 
-    def detect_protocol(self) -> str:
+    def detect_protocol(self) -> Protocol:
         if self.port == 443:
-            return 'https'
+            return Protocol.HTTPS
         elif self.port == 80:
-            return 'http'
+            return Protocol.HTTP
         else:
             # Default to HTTP if protocol is not specified
-            return self.protocol if self.protocol else 'http'
+            return self.protocol if self.protocol else Protocol.HTTP
 
     def get_region(self) -> dict:
+        from proxy_scraper.util.geo import geo_info
+
         try:
             return geo_info.get_region(self.host)
         except Exception as e:
@@ -0,0 +1,201 @@
+import math
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from proxy_scraper.protocol import Protocol
+from proxy_scraper.proxy import Proxy, ProxyTiming, int_to_ip
+
+PROTOCOLS: List[Protocol] = list(Protocol)
+PROTOCOL_CODES: Dict[Protocol, int] = {protocol: code for code, protocol in enumerate(PROTOCOLS)}
+
+UNKNOWN_COUNTRY = 'Unknown'
+# Packed country values below any real code: not looked up yet, and looked up without a result
+UNRESOLVED = 0
+UNRESOLVABLE = 1
+
+
+def pack_country(code: Optional[str]) -> int:
+    """Pack a two-letter country code into 16 bits."""
+    if code and len(code) == 2 and code.isalpha():
+        code = code.upper()
+        return (ord(code[0]) << 8) | ord(code[1])
+    return UNRESOLVED
+
+
+def unpack_country(value: int) -> str:
+    return chr(value >> 8) + chr(value & 0xFF) if value > UNRESOLVABLE else UNKNOWN_COUNTRY
+
+
+def proxy_key(proxy: Proxy) -> int:
+    """The integer ProxyBatch.keys() uses for a proxy: ip, port and protocol code packed into 56 bits."""
+    return (proxy.ip << 24) | (proxy.port << 8) | PROTOCOL_CODES[proxy.protocol]
+
+
+class ProxyBatch:
+    """Column-oriented collection of proxies backed by typed arrays.
+
+    Each proxy costs 9 bytes (IPv4, port, protocol code, packed country) instead of a
+    Python object, and dedup, grouping and sorting work on those integers. Credentials
+    and check timings only exist for some rows, so they live in sparse dicts keyed by
+    row. Iterating or indexing yields Proxy objects, so a batch can be passed anywhere a
+    list of proxies was expected.
+    """
+
+    __slots__ = ('ips', 'ports', 'protocols', 'countries', 'credentials', 'timings')
+
+    def __init__(self):
+        self.ips = array('I')
+        self.ports = array('H')
+        self.protocols = array('B')
+        self.countries = array('H')
+        self.credentials: Dict[int, Tuple[Optional[str], Optional[str]]] = {}
+        self.timings: Dict[int, ProxyTiming] = {}
+
+    @classmethod
+    def from_proxies(cls, proxies: Iterable[Proxy]) -> 'ProxyBatch':
+        if isinstance(proxies, cls):
+            return proxies
+        batch = cls()
+        batch.extend(proxies)
+        return batch
+
+    def append(self, proxy: Proxy, timing: Optional[ProxyTiming] = None):
+        if proxy.username or proxy.password:
+            self.credentials[len(self.ips)] = (proxy.username, proxy.password)
+        if timing is not None:
+            self.timings[len(self.ips)] = timing
+        self.ips.append(proxy.ip)
+        self.ports.append(proxy.port)
+        self.protocols.append(PROTOCOL_CODES[proxy.protocol])
+        self.countries.append(pack_country(proxy.country))
+
+    def extend(self, proxies: Iterable[Proxy]):
+        if isinstance(proxies, ProxyBatch):
+            offset = len(self.ips)
+            self.credentials.update({offset + row: value for row, value in proxies.credentials.items()})
+            self.timings.update({offset + row: value for row, value in proxies.timings.items()})
+            self.ips.extend(proxies.ips)
+            self.ports.extend(proxies.ports)
+            self.protocols.extend(proxies.protocols)
+            self.countries.extend(proxies.countries)
+            return
+        for proxy in proxies:
+            self.append(proxy)
+
+    def __len__(self) -> int:
+        return len(self.ips)
+
+    def __getitem__(self, index: int) -> Proxy:
+        username, password = self.credentials.get(index, (None, None))
+        country = self.countries[index]
+        return Proxy.from_packed(
+            self.ips[index],
+            self.ports[index],
+            PROTOCOLS[self.protocols[index]],
+            username=username,
+            password=password,
+            country=unpack_country(country) if country > UNRESOLVABLE else None,
+        )
+
+    def __iter__(self) -> Iterator[Proxy]:
+        for index in range(len(self.ips)):
+            yield self[index]
+
+    def keys(self) -> List[int]:
+        """One integer per row identifying (ip, port, protocol), ordered by ip, then port."""
+        return [
+            (ip << 24) | (port << 8) | protocol
+            for ip, port, protocol in zip(self.ips, self.ports, self.protocols)
+        ]
+
+    def take(self, indexes: Iterable[int]) -> 'ProxyBatch':
+        indexes = list(indexes)
+        batch = ProxyBatch()
+        batch.ips = array('I', [self.ips[i] for i in indexes])
+        batch.ports = array('H', [self.ports[i] for i in indexes])
+        batch.protocols = array('B', [self.protocols[i] for i in indexes])
+        batch.countries = array('H', [self.countries[i] for i in indexes])
+        if self.credentials:
+            batch.credentials = {
+                row: self.credentials[i] for row, i in enumerate(indexes) if i in self.credentials
+            }
+        if self.timings:
+            batch.timings = {row: self.timings[i] for row, i in enumerate(indexes) if i in self.timings}
+        return batch
+
+    def unique(self) -> 'ProxyBatch':
+        first_rows = {}
+        for row, key in enumerate(self.keys()):
+            first_rows.setdefault(key, row)
+        if len(first_rows) == len(self):
+            return self
+        return self.take(first_rows.values())
+
+    def sorted(self) -> 'ProxyBatch':
+        keys = self.keys()
+        return self.take(sorted(range(len(keys)), key=keys.__getitem__))
+
+    def ranked(self, max_latency: Optional[float] = None, top: Optional[int] = None) -> 'ProxyBatch':
+        """Rows ordered by total check time, fastest first, optionally trimmed.
+
+        Rows without a timing sort last in address order, and are dropped when ``max_latency``
+        (seconds) is given. ``top`` keeps only that many of the fastest rows.
+        """
+        keys = self.keys()
+        timings = self.timings
+        latencies = [timings[row].total if row in timings else math.inf for row in range(len(keys))]
+        rows = sorted(range(len(keys)), key=lambda row: (latencies[row], keys[row]))
+        if max_latency is not None:
+            rows = [row for row in rows if latencies[row] <= max_latency]
+        if top is not None:
+            rows = rows[:top]
+        return self.take(rows)
+
+    def _group_rows(self, codes: Iterable[int]) -> Dict[int, List[int]]:
+        groups: Dict[int, List[int]] = {}
+        for row, code in enumerate(codes):
+            rows = groups.get(code)
+            if rows is None:
+                groups[code] = rows = []
+            rows.append(row)
+        return groups
+
+    def group_by_protocol(self) -> Dict[Protocol, 'ProxyBatch']:
+        return {PROTOCOLS[code]: self.take(rows) for code, rows in self._group_rows(self.protocols).items()}
+
+    def group_by_country_and_protocol(self) -> Dict[str, Dict[Protocol, 'ProxyBatch']]:
+        groups: Dict[str, Dict[Protocol, ProxyBatch]] = {}
+        codes = ((country << 8) | protocol for country, protocol in zip(self.countries, self.protocols))
+        for code, rows in self._group_rows(codes).items():
+            country = unpack_country(code >> 8)
+            groups.setdefault(country, {})[PROTOCOLS[code & 0xFF]] = self.take(rows)
+        return groups
+
+    def addresses(self) -> Iterator[str]:
+        for ip, port in zip(self.ips, self.ports):
+            yield f"{int_to_ip(ip)}:{port}"
+
+    def country_codes(self) -> Iterator[str]:
+        return map(unpack_country, self.countries)
+
+    async def resolve_countries(self):
+        """Look up the country of every row that has none, in one GeoInfo.resolve_many call.
+
+        Results are stored in the batch, so later stages never look the same proxies up again.
+        """
+        from proxy_scraper.util.geo import geo_info
+
+        missing: Dict[int, List[int]] = {}
+        for row, (ip, country) in enumerate(zip(self.ips, self.countries)):
+            if country == UNRESOLVED:
+                missing.setdefault(ip, []).append(row)
+        if not missing:
+            return
+
+        hosts = {ip: int_to_ip(ip) for ip in missing}
+        regions = await geo_info.resolve_many(hosts.values())
+        for ip, rows in missing.items():
+            region = regions.get(hosts[ip])
+            packed = pack_country(region.get('countryCode') if region else None) or UNRESOLVABLE
+            for row in rows:
+                self.countries[row] = packed
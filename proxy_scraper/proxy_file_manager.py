@@ -1,37 +1,103 @@
+import logging
 import os
-from typing import List
+from typing import AsyncIterator, Iterator, List
 
 from proxy_scraper.config import CONFIG
+from proxy_scraper.parser import iter_records
 from proxy_scraper.proxy import Proxy
+from proxy_scraper.proxy_batch import ProxyBatch
+from proxy_scraper.raw_store import get_raw_store
+from proxy_scraper.util.aio import io_thread
+
+logger = logging.getLogger(__name__)
 
 PROXY_DIR = CONFIG['proxy_dir']
+RAW_DIR = os.path.join(PROXY_DIR, 'raw')
+# Proxies parsed per chunk by the streaming readers
+CHUNK_SIZE = CONFIG.get('reader', {}).get('chunk_size', 5000)
 
 class ProxyFileManager:
+    """Reads the raw lists. The ``iter_*`` and ``aiter_*`` readers stream them in chunks of
+    ``chunk_size`` parsed proxies, so memory use does not grow with the size of the lists.
+    Every proxy keeps the country column of its line, if it had one."""
+
     @staticmethod
-    def read_proxies_from_raw_directory(directory: str = os.path.join(PROXY_DIR, 'raw')) -> List[Proxy]:
-        proxies = []
-        for filename in os.listdir(directory):
-            file_path = os.path.join(directory, filename)
-            if os.path.isfile(file_path) and filename.endswith('.txt'):
-                proxies.extend(ProxyFileManager.read_proxies_from_file(file_path))
+    def read_proxies_from_raw_directory(directory: str = RAW_DIR) -> ProxyBatch:
+        proxies = ProxyBatch()
+        for chunk in ProxyFileManager.iter_proxy_chunks(directory):
+            proxies.extend(chunk)
         return proxies
 
     @staticmethod
-    def read_proxies_from_file(file_path: str) -> List[Proxy]:
-        proxies = []
-        protocol = ProxyFileManager.extract_protocol_from_filename(file_path)
-        with open(file_path, 'r') as file:
-            for line in file:
-                line = line.strip()
-                if line:
-                    parts = line.split(' ')
-                    host_ip = parts[0]
-                    country = parts[1] if len(parts) > 1 else ''
-                    if ':' in host_ip:
-                        host, ip = host_ip.split(':', 1)
-                        proxies.append(Proxy(host, ip, protocol, country))
+    def iter_proxies_from_raw_directory(directory: str = RAW_DIR, chunk_size: int = CHUNK_SIZE) -> Iterator[Proxy]:
+        for chunk in ProxyFileManager.iter_proxy_chunks(directory, chunk_size):
+            yield from chunk
+
+    @staticmethod
+    async def aiter_proxies_from_raw_directory(
+        directory: str = RAW_DIR, chunk_size: int = CHUNK_SIZE
+    ) -> AsyncIterator[Proxy]:
+        async for chunk in ProxyFileManager.aiter_proxy_chunks(directory, chunk_size):
+            for proxy in chunk:
+                yield proxy
+
+    @staticmethod
+    def iter_proxy_chunks(directory: str = RAW_DIR, chunk_size: int = CHUNK_SIZE) -> Iterator[ProxyBatch]:
+        for file_path in ProxyFileManager.list_raw_files(directory):
+            yield from ProxyFileManager.iter_chunks_from_file(file_path, chunk_size)
+
+    @staticmethod
+    async def aiter_proxy_chunks(directory: str = RAW_DIR, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[ProxyBatch]:
+        """Like iter_proxy_chunks, but every chunk is read and parsed on the I/O thread."""
+        chunks = ProxyFileManager.iter_proxy_chunks(directory, chunk_size)
+        try:
+            while (chunk := await io_thread.run(next, chunks, None)) is not None:
+                yield chunk
+        finally:
+            # Closes the file being read when the consumer stops early
+            await io_thread.run(chunks.close)
+
+    @staticmethod
+    def count_raw_proxies(directory: str = RAW_DIR) -> int:
+        """Distinct proxies in the raw lists, from the raw store's indexes instead of parsing every line."""
+        return get_raw_store(directory).count()
+
+    @staticmethod
+    def list_raw_files(directory: str = RAW_DIR) -> List[str]:
+        if not os.path.isdir(directory):
+            logger.warning(f"Raw proxy directory {directory} does not exist")
+            return []
+        return [
+            os.path.join(directory, filename)
+            for filename in sorted(os.listdir(directory))
+            if filename.endswith('.txt') and os.path.isfile(os.path.join(directory, filename))
+        ]
+
+    @staticmethod
+    def read_proxies_from_file(file_path: str) -> ProxyBatch:
+        proxies = ProxyBatch()
+        for chunk in ProxyFileManager.iter_chunks_from_file(file_path):
+            proxies.extend(chunk)
         return proxies
 
+    @staticmethod
+    def iter_chunks_from_file(file_path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[ProxyBatch]:
+        protocol = ProxyFileManager.extract_protocol_from_filename(file_path)
+        chunk = ProxyBatch()
+        # Lines are read one at a time, the file is never loaded as a whole
+        with open(file_path, 'r', errors='ignore') as file:
+            for record in iter_records(file):
+                try:
+                    chunk.append(Proxy.from_record(record, protocol))
+                except ValueError as e:
+                    logger.debug(f"Skipping malformed proxy {record} in {file_path}: {e}")
+                    continue
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = ProxyBatch()
+        if chunk:
+            yield chunk
+
     @staticmethod
     def extract_protocol_from_filename(filename: str) -> str:
         return os.path.basename(filename).rsplit('.', 1)[0]
@@ -0,0 +1,170 @@
+import atexit
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from proxy_scraper.config import CONFIG
+from proxy_scraper.proxy import Proxy
+
+logger = logging.getLogger(__name__)
+
+HEALTH_CONFIG = CONFIG.get('validator', {}).get('health', {})
+DB_NAME = HEALTH_CONFIG.get('db', 'proxy_health.db')
+RECHECK_INTERVAL = HEALTH_CONFIG.get('recheck_interval', 3600)
+RETRY_INTERVAL = HEALTH_CONFIG.get('retry_interval', 3600)
+MAX_BACKOFF = HEALTH_CONFIG.get('max_backoff', 7 * 24 * 3600)
+RETENTION = HEALTH_CONFIG.get('retention_days', 30) * 24 * 3600
+# Beyond this many consecutive failures the backoff is capped by MAX_BACKOFF anyway
+MAX_BACKOFF_EXPONENT = 20
+
+HealthKey = Tuple[int, int, str]
+
+
+class LastCheck(NamedTuple):
+    passed: bool
+    # Total time of the latest successful check, in seconds
+    latency: Optional[float]
+
+
+class CheckResult(NamedTuple):
+    proxy: Proxy
+    is_valid: bool
+    checked_at: float
+    latency: Optional[float] = None
+
+
+def health_key(proxy: Proxy) -> HealthKey:
+    return proxy.ip, proxy.port, proxy.protocol.value
+
+
+class ProxyHealthStore:
+    """sqlite record of every proxy's check history, used to decide what to validate next.
+
+    Each row keeps the last check time, last latency, consecutive failures and the
+    success/check counters. After a success a proxy is due again ``recheck_interval``
+    seconds later; after its n-th consecutive failure the wait is
+    ``retry_interval * 2 ** (n - 1)``, capped at ``max_backoff``. The schedule of a whole
+    run is read with one query (``schedule``) and results are written in one transaction
+    (``record_many``).
+    """
+
+    def __init__(
+        self,
+        db_name: str = DB_NAME,
+        recheck_interval: float = RECHECK_INTERVAL,
+        retry_interval: float = RETRY_INTERVAL,
+        max_backoff: float = MAX_BACKOFF,
+    ):
+        self.db_name = db_name
+        self.recheck_interval = recheck_interval
+        self.retry_interval = retry_interval
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self.conn = self._init_db()
+        atexit.register(self.close)
+
+    def _init_db(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_name, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS health (
+                            ip INTEGER NOT NULL,
+                            port INTEGER NOT NULL,
+                            protocol TEXT NOT NULL,
+                            last_checked REAL NOT NULL,
+                            latency REAL,
+                            failures INTEGER NOT NULL,
+                            checks INTEGER NOT NULL,
+                            successes INTEGER NOT NULL,
+                            next_check REAL NOT NULL,
+                            PRIMARY KEY (ip, port, protocol)) WITHOUT ROWID"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS health_next_check ON health (next_check)")
+        conn.commit()
+        logger.info(f"Opened proxy health database {self.db_name}")
+        return conn
+
+    def schedule(self, now: Optional[float] = None) -> Dict[HealthKey, LastCheck]:
+        """Proxies that are not due for a check yet, mapped to the outcome of their last check.
+
+        Anything missing from the result (never checked, or its wait is over) is due.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT ip, port, protocol, failures, latency FROM health WHERE next_check > ?", (now,)
+            ).fetchall()
+        return {
+            (ip, port, protocol): LastCheck(failures == 0, latency)
+            for ip, port, protocol, failures, latency in rows
+        }
+
+    def record_many(self, results: Iterable[CheckResult]):
+        rows = [
+            {
+                'ip': result.proxy.ip,
+                'port': result.proxy.port,
+                'protocol': result.proxy.protocol.value,
+                'checked_at': result.checked_at,
+                'latency': result.latency,
+                'success': int(result.is_valid),
+                'next_check': result.checked_at + (self.recheck_interval if result.is_valid else self.retry_interval),
+                'recheck': self.recheck_interval,
+                'retry': self.retry_interval,
+                'max_backoff': self.max_backoff,
+                'max_exponent': MAX_BACKOFF_EXPONENT,
+            }
+            for result in results
+        ]
+        if not rows:
+            return
+        with self._lock:
+            with self.conn:
+                # On conflict the right-hand sides see the stored row, so failures is the previous streak
+                self.conn.executemany(
+                    """INSERT INTO health
+                        (ip, port, protocol, last_checked, latency, failures, checks, successes, next_check)
+                    VALUES (:ip, :port, :protocol, :checked_at, :latency, 1 - :success, 1, :success, :next_check)
+                    ON CONFLICT (ip, port, protocol) DO UPDATE SET
+                        last_checked = excluded.last_checked,
+                        latency = COALESCE(excluded.latency, latency),
+                        checks = checks + 1,
+                        successes = successes + excluded.successes,
+                        failures = CASE WHEN excluded.successes THEN 0 ELSE failures + 1 END,
+                        next_check = excluded.last_checked + CASE
+                            WHEN excluded.successes THEN :recheck
+                            ELSE MIN(:retry * (1 << MIN(failures, :max_exponent)), :max_backoff)
+                        END""",
+                    rows,
+                )
+        logger.debug(f"Recorded {len(rows)} proxy checks")
+
+    def prune(self, max_age: float = RETENTION, now: Optional[float] = None) -> int:
+        """Forget proxies that have not been checked for ``max_age`` seconds."""
+        now = time.time() if now is None else now
+        with self._lock:
+            with self.conn:
+                deleted = self.conn.execute(
+                    "DELETE FROM health WHERE last_checked < ?", (now - max_age,)
+                ).rowcount
+        if deleted:
+            logger.info(f"Pruned {deleted} proxies from the health database")
+        return deleted
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            total, healthy, due = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(failures = 0), 0), COALESCE(SUM(next_check <= ?), 0) FROM health",
+                (time.time(),),
+            ).fetchone()
+        return {"tracked": total, "healthy": healthy, "due": due}
+
+    def close(self):
+        with self._lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+                logger.info(f"Closed proxy health database {self.db_name}")
@@ -1,21 +1,235 @@
 import asyncio
 import logging
-from typing import List
+import math
+import time
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
 
-from proxy_scraper.proxy import Proxy
+from proxy_scraper.config import CONFIG
+from proxy_scraper.probe import probe, resolve_target
+from proxy_scraper.proxy import Proxy, ProxyTiming
+from proxy_scraper.proxy_batch import ProxyBatch
+from proxy_scraper.proxy_health import CheckResult, HealthKey, LastCheck, ProxyHealthStore, health_key
+from proxy_scraper.transport import ValidationTransport
+from proxy_scraper.util.aio import io_thread
 
 logger = logging.getLogger(__name__)
 
+VALIDATOR_CONFIG = CONFIG.get('validator', {})
+CONCURRENCY = VALIDATOR_CONFIG.get('concurrency', 500)
+QUEUE_SIZE = VALIDATOR_CONFIG.get('queue_size', 1000)
+PROGRESS_INTERVAL = VALIDATOR_CONFIG.get('progress_interval', 5)
+PROTOCOL_CONCURRENCY = VALIDATOR_CONFIG.get('protocol_concurrency', {})
+PREFILTER = VALIDATOR_CONFIG.get('prefilter', True)
+# Check results are written to the health store in batches of this size
+HEALTH_FLUSH_SIZE = 1000
+
+
+class ValidationProgress:
+    def __init__(self, total: Optional[int] = None):
+        self.total = total
+        self.checked = 0
+        self.valid = 0
+        self.prefiltered = 0
+        # Not due for a recheck according to the health store; the reused ones passed their last check
+        self.skipped = 0
+        self.reused = 0
+        self.started_at = time.monotonic()
+
+    def record(self, is_valid: bool):
+        self.checked += 1
+        if is_valid:
+            self.valid += 1
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def rate(self) -> float:
+        elapsed = self.elapsed
+        return self.checked / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        if self.total is None or not self.rate:
+            return None
+        return max(self.total - self.checked - self.skipped, 0) / self.rate
+
+    def __str__(self):
+        total = self.total if self.total is not None else '?'
+        eta = f"{self.eta:.0f}s" if self.eta is not None else '?'
+        return (
+            f"{self.checked}/{total} checked, {self.valid} valid, {self.prefiltered} dropped by pre-filter, "
+            f"{self.skipped} not due ({self.reused} kept as valid), {self.rate:.1f}/s, ETA {eta}"
+        )
+
+
 class ProxyValidator:
-    # def __init__(self):
-    #     self.writer = ProxyWriter()
-
-    # async def validate_proxies_in_directory(self, directory: str):
-    #     proxies = ProxyFileManager.read_proxies_from_directory(directory)
-    #     valid_proxies = await self.validate_proxies(proxies)
-    #     return valid_proxies
-
-    async def validate_proxies(self, proxies: List[Proxy]) -> List[Proxy]:
-        tasks = [proxy.is_valid() for proxy in proxies]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        return [proxy for proxy, result in zip(proxies, results) if result is True]
+    def __init__(
+        self,
+        concurrency: int = CONCURRENCY,
+        protocol_concurrency: Optional[Dict[str, int]] = None,
+        queue_size: int = QUEUE_SIZE,
+        prefilter: bool = PREFILTER,
+        health_store: Optional[ProxyHealthStore] = None,
+    ):
+        self.concurrency = concurrency
+        self.prefilter = prefilter
+        self.health_store = health_store
+        self.results: List[CheckResult] = []
+        self.queue_size = queue_size
+        limits = PROTOCOL_CONCURRENCY if protocol_concurrency is None else protocol_concurrency
+        self.protocol_semaphores = {protocol: asyncio.Semaphore(limit) for protocol, limit in limits.items()}
+        self.progress: Optional[ValidationProgress] = None
+        self.transport: Optional[ValidationTransport] = None
+
+    async def validate_proxies(self, proxies: Union[Iterable[Proxy], AsyncIterable[Proxy]]) -> ProxyBatch:
+        valid_proxies = ProxyBatch()
+        async for proxy, timing in self.iter_valid(proxies):
+            valid_proxies.append(proxy, timing)
+        return valid_proxies
+
+    async def iter_valid(
+        self, proxies: Union[Iterable[Proxy], AsyncIterable[Proxy]], total: Optional[int] = None
+    ) -> AsyncIterator[Tuple[Proxy, ProxyTiming]]:
+        """Yield every valid proxy with its check timing as soon as it passes.
+
+        ``total`` is the expected number of proxies, used for the ETA when ``proxies`` has no length.
+        """
+        if hasattr(proxies, '__len__'):
+            total = len(proxies)
+            if total == 0:
+                return
+
+        self.progress = ValidationProgress(total)
+        self.results = []
+        schedule = await io_thread.run(self.health_store.schedule) if self.health_store else {}
+        if self.prefilter:
+            await self._resolve_probe_target()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        output = asyncio.Queue(maxsize=self.queue_size)
+
+        # A total passed in is only an estimate, so only an exact length caps the workers
+        worker_count = min(self.concurrency, len(proxies)) if hasattr(proxies, '__len__') else self.concurrency
+        async with ValidationTransport() as self.transport:
+            workers = [asyncio.create_task(self._worker(queue, output)) for _ in range(worker_count)]
+            reporter = asyncio.create_task(self._report_progress())
+            feeder = asyncio.create_task(self._feed(proxies, queue, output, schedule))
+
+            try:
+                while (item := await output.get()) is not None:
+                    yield item
+                # Re-raises an error from the source iterable
+                await feeder
+            finally:
+                for task in workers + [reporter, feeder]:
+                    task.cancel()
+                await asyncio.gather(*workers, reporter, feeder, return_exceptions=True)
+                # Also after an interrupted run, so the checks that did finish are not repeated
+                await self._flush_results()
+                await self._prune_health()
+        self.transport = None
+
+        logger.info(f"Validation finished: {self.progress}")
+
+    async def _feed(
+        self,
+        proxies: Union[Iterable[Proxy], AsyncIterable[Proxy]],
+        queue: asyncio.Queue,
+        output: asyncio.Queue,
+        schedule: Dict[HealthKey, LastCheck],
+    ):
+        try:
+            # Blocks once the queue is full, so producers never run ahead of the workers
+            if hasattr(proxies, '__aiter__'):
+                async for proxy in proxies:
+                    await self._submit(queue, output, proxy, schedule)
+            else:
+                for proxy in proxies:
+                    await self._submit(queue, output, proxy, schedule)
+            await queue.join()
+        finally:
+            await output.put(None)
+
+    async def _submit(
+        self, queue: asyncio.Queue, output: asyncio.Queue, proxy: Proxy, schedule: Dict[HealthKey, LastCheck]
+    ):
+        last_check = schedule.get(health_key(proxy)) if schedule else None
+        if last_check is None:
+            await queue.put(proxy)
+            return
+        self.progress.skipped += 1
+        if last_check.passed:
+            self.progress.reused += 1
+            # Only the total of the previous check is stored, which is what ranking uses
+            latency = last_check.latency if last_check.latency is not None else math.inf
+            await output.put((proxy, ProxyTiming(math.nan, math.nan, latency)))
+
+    async def _worker(self, queue: asyncio.Queue, output: asyncio.Queue):
+        while True:
+            proxy = await queue.get()
+            # _feed waits for queue.join(), so every proxy taken must be marked done, whatever happens
+            try:
+                await self._process(proxy, output)
+            finally:
+                queue.task_done()
+
+    async def _process(self, proxy: Proxy, output: asyncio.Queue):
+        checked_at = time.time()
+        try:
+            timing = await self._check(proxy)
+        except Exception as e:
+            logger.debug(f"Error validating proxy {proxy}: {e}")
+            timing = None
+
+        is_valid = timing is not None
+        if self.health_store:
+            self.results.append(CheckResult(proxy, is_valid, checked_at, timing.total if timing else None))
+            if len(self.results) >= HEALTH_FLUSH_SIZE:
+                await self._flush_results()
+        self.progress.record(is_valid)
+        if is_valid:
+            await output.put((proxy, timing))
+
+    async def _flush_results(self):
+        results, self.results = self.results, []
+        if not (self.health_store and results):
+            return
+        try:
+            # The commit runs on the I/O thread while the other workers keep checking
+            await io_thread.run(self.health_store.record_many, results)
+        except Exception as e:
+            # Only the scheduling of these proxies is lost; they are checked again next run
+            logger.error(f"Error recording {len(results)} proxy checks in the health database: {e}")
+
+    async def _prune_health(self):
+        if not self.health_store:
+            return
+        try:
+            await io_thread.run(self.health_store.prune)
+        except Exception as e:
+            # Shard processes share the database; old rows are pruned by a later run
+            logger.error(f"Error pruning the health database: {e}")
+
+    async def _resolve_probe_target(self):
+        try:
+            await resolve_target()
+        except OSError as e:
+            # The SOCKS4 probes retry the lookup and fail like the full check would
+            logger.warning(f"Could not resolve the validate URL host for the pre-filter: {e}")
+
+    async def _check(self, proxy: Proxy) -> Optional[ProxyTiming]:
+        if self.prefilter and not await probe(proxy):
+            self.progress.prefiltered += 1
+            return None
+
+        semaphore = self.protocol_semaphores.get(proxy.protocol)
+        if semaphore is None:
+            return await proxy.check(self.transport)
+        async with semaphore:
+            return await proxy.check(self.transport)
+
+    async def _report_progress(self):
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            logger.info(f"Validation progress: {self.progress}")
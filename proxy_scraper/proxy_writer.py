@@ -1,105 +1,160 @@
+import csv
+import glob
+import hashlib
+import io
 import logging
+import math
 import os
-from typing import Dict, List, Set
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from proxy_scraper.config import (
     CONFIG,  # Assuming CONFIG is defined and contains 'proxy_dir'
 )
+from proxy_scraper.protocol import Protocol
 from proxy_scraper.proxy import Proxy
+from proxy_scraper.proxy_batch import ProxyBatch
+from proxy_scraper.raw_store import get_raw_store
+from proxy_scraper.util.aio import io_thread
+from proxy_scraper.util.files import file_digest, write_atomically
 
 logger = logging.getLogger(__name__)
 
 PROXY_DIR = CONFIG['proxy_dir']  # Default directory for saving proxies
+# Size of the thread pool in _write_files
+WRITE_WORKERS = CONFIG.get('writer', {}).get('workers', 8)
 
-class ProxyWriter:
-    def __init__(self, directory: str = PROXY_DIR):
-        self.directory = directory
+TIMING_COLUMNS = ['proxy', 'protocol', 'country', 'connect_ms', 'ttfb_ms', 'total_ms']
 
-    def save_raw_proxies(self, proxies: List[Proxy]):
-        raw_directory = os.path.join(self.directory, 'raw')
-        self._save_proxies(proxies, raw_directory, include_country=False, append=True)
 
-    def save_proxies(self, proxies: List[Proxy]):
-        self._save_proxies(proxies, self.directory, include_country=True, append=False)
+class ProxyWriter:
+    """Writes proxy lists. Validated lists are ranked fastest first by their check timing
+    and can be trimmed to ``max_latency`` seconds and/or the ``top`` fastest per file.
 
-    def save_country_proxies(self, proxies: List[Proxy]):
-        country_protocol_groups = self._group_proxies_by_country_and_protocol(proxies)
+    Coroutines should use the ``*_async`` methods, which run the blocking writes on the
+    shared I/O thread.
+    """
 
+    def __init__(self, directory: str = PROXY_DIR, max_latency: Optional[float] = None, top: Optional[int] = None):
+        self.directory = directory
+        self.max_latency = max_latency
+        self.top = top
+
+    def save_raw_proxies(self, proxies: Iterable[Proxy]) -> int:
+        # The store knows which proxies each list holds, so only new ones are appended
+        return get_raw_store(os.path.join(self.directory, 'raw')).add(proxies)
+
+    async def save_raw_proxies_async(self, proxies: Iterable[Proxy]) -> int:
+        return await io_thread.run(self.save_raw_proxies, list(proxies))
+
+    def compact_raw_proxies(self) -> int:
+        # Rewrites the raw lists whose share of stale lines is above raw_store.compact_ratio
+        return get_raw_store(os.path.join(self.directory, 'raw')).compact()
+
+    async def compact_raw_proxies_async(self) -> int:
+        return await io_thread.run(self.compact_raw_proxies)
+
+    async def save_lists_async(self, proxies: Iterable[Proxy], country_lists: bool = True):
+        """Rewrite the per-protocol and per-country lists; a batch is not copied, so leave it unchanged until then."""
+        await io_thread.run(self.save_lists, proxies, country_lists)
+
+    def save_lists(self, proxies: Iterable[Proxy], country_lists: bool = True):
+        """Without ``country_lists``, e.g. when countries could not be resolved, the country files are kept as is.
+
+        Proxies without a country would otherwise all land in Unknown.txt and every other
+        country file would be removed as stale.
+        """
+        batch = ProxyBatch.from_proxies(proxies)
+        self.save_proxies(batch)
+        if country_lists:
+            self.save_country_proxies(batch)
+        else:
+            logger.warning(f"Countries are incomplete, keeping the per-country lists in {self.directory} as they are")
+
+    def save_proxies(self, proxies: Iterable[Proxy]):
+        # Resolve countries up front with ProxyBatch.resolve_countries(); unresolved rows are written as Unknown
+        batch = ProxyBatch.from_proxies(proxies).unique()
+        groups = batch.group_by_protocol()
+
+        # Every protocol gets a list, empty if nothing passed, so a list never outlives its proxies
+        outputs = {}
+        for protocol in Protocol:
+            group = self._rank(groups.get(protocol, ProxyBatch()))
+            lines = [f"{address} {country}" for address, country in zip(group.addresses(), group.country_codes())]
+            outputs[os.path.join(self.directory, f'{protocol}.txt')] = self._format_lines(lines)
+            outputs[os.path.join(self.directory, f'{protocol}.csv')] = self._format_timings(protocol, group)
+        self._write_files(outputs)
+
+    def save_country_proxies(self, proxies: Iterable[Proxy]):
+        batch = ProxyBatch.from_proxies(proxies).unique()
+        country_protocol_groups = batch.group_by_country_and_protocol()
+
+        outputs = {}
         for country_code, protocol_groups in country_protocol_groups.items():
-            for protocol, proxy_list in protocol_groups.items():
-                protocol_directory = os.path.join(self.directory, protocol)
-                os.makedirs(protocol_directory, exist_ok=True)
-
-                filepath = os.path.join(protocol_directory, f'{country_code}.txt')
-
-                formatted_proxies = {f"{proxy.get_address()}" for proxy in proxy_list}
-                self._write_proxies_to_file(filepath, formatted_proxies, append=False)
-                logger.info(f"Saved {len(formatted_proxies)} {protocol} proxies for {country_code} to {filepath}")
-
-    def _save_proxies(self, proxies: List[Proxy], directory: str, include_country: bool, append: bool):
-        if not proxies:
-            logger.info("No proxies provided to save.")
-            return
-
-        os.makedirs(directory, exist_ok=True)
-
-        protocol_groups = self._group_proxies_by_protocol(proxies)
-
-        for protocol, proxy_list in protocol_groups.items():
-            filepath = os.path.join(directory, f'{protocol}.txt')
-
-            if include_country:
-                formatted_proxies = {f"{proxy.get_address()} {proxy.get_country()}" for proxy in proxy_list}
-            else:
-                formatted_proxies = {proxy.get_address() for proxy in proxy_list}
-
-            if append:
-                existing_proxies = self._read_existing_proxies(filepath)
-                new_proxies = {fp for fp in formatted_proxies if fp not in existing_proxies}
-            else:
-                new_proxies = formatted_proxies
-
-            if new_proxies:
-                self._write_proxies_to_file(filepath, new_proxies, append)
-                logger.info(f"Added {len(new_proxies)} new {protocol} proxies to {filepath}")
-            else:
-                logger.info(f"No new proxies to add for {protocol} to {filepath}")
-
-    def _group_proxies_by_protocol(self, proxies: List[Proxy]) -> Dict[str, List[Proxy]]:
-        protocol_groups = {}
-        for proxy in proxies:
-            protocol = proxy.protocol
-            if protocol not in protocol_groups:
-                protocol_groups[protocol] = []
-            protocol_groups[protocol].append(proxy)
-        return protocol_groups
-
-    def _group_proxies_by_country_and_protocol(self, proxies: List[Proxy]) -> Dict[str, Dict[str, List[Proxy]]]:
-        country_protocol_groups = {}
-        for proxy in proxies:
-            country = proxy.get_country()
-            protocol = proxy.protocol
-            if country not in country_protocol_groups:
-                country_protocol_groups[country] = {}
-            if protocol not in country_protocol_groups[country]:
-                country_protocol_groups[country][protocol] = []
-            country_protocol_groups[country][protocol].append(proxy)
-        return country_protocol_groups
-
-    def _read_existing_proxies(self, filepath: str) -> Set[str]:
-        if not os.path.exists(filepath):
-            return set()
-        try:
-            with open(filepath, 'r') as f:
-                return {line.strip().split()[0] for line in f.readlines()}  # Extract only the IP part
-        except Exception as e:
-            logger.error(f"Error reading proxies from {filepath}: {e}")
-            return set()
-
-    def _write_proxies_to_file(self, filepath: str, proxies: Set[str], append: bool):
-        mode = 'a' if append else 'w'
+            for protocol, group in protocol_groups.items():
+                addresses = list(self._rank(group).addresses())
+                if addresses:
+                    path = os.path.join(self.directory, protocol, f'{country_code}.txt')
+                    outputs[path] = self._format_lines(addresses)
+
+        stale = [
+            path
+            for protocol in Protocol
+            for path in glob.glob(os.path.join(self.directory, protocol, '*.txt'))
+            if path not in outputs
+        ]
+        self._write_files(outputs, stale)
+
+    def _rank(self, batch: ProxyBatch) -> ProxyBatch:
+        return batch.ranked(max_latency=self.max_latency, top=self.top)
+
+    def _format_lines(self, lines: List[str]) -> bytes:
+        return ''.join(f"{line}\n" for line in lines).encode()
+
+    def _format_timings(self, protocol: str, batch: ProxyBatch) -> bytes:
+        # Sidecar with the same rows in the same order as the .txt list, for pickers that want the timings
+        def ms(value: float) -> str:
+            return f"{value * 1000:.1f}" if math.isfinite(value) else ''
+
+        buffer = io.StringIO(newline='')
+        writer = csv.writer(buffer)
+        writer.writerow(TIMING_COLUMNS)
+        for row, (address, country) in enumerate(zip(batch.addresses(), batch.country_codes())):
+            timing = batch.timings.get(row)
+            timings = [ms(value) for value in timing] if timing else ['', '', '']
+            writer.writerow([address, protocol, country, *timings])
+        return buffer.getvalue().encode()
+
+    def _write_files(self, outputs: Dict[str, bytes], stale: Iterable[str] = ()):
+        """Write every file that changed, in parallel, each through a temp file and a rename."""
+        for directory in {os.path.dirname(path) for path in outputs}:
+            os.makedirs(directory, exist_ok=True)
+
+        with ThreadPoolExecutor(max_workers=WRITE_WORKERS) as pool:
+            results = list(pool.map(self._write_if_changed, outputs.items()))
+
+        removed = 0
+        for path in stale:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError as e:
+                logger.error(f"Error removing stale proxy list {path}: {e}")
+
+        written = results.count(True)
+        logger.info(
+            f"Saved proxy lists in {self.directory}: {written} written, "
+            f"{len(results) - written} unchanged, {removed} stale removed"
+        )
+
+    def _write_if_changed(self, item: Tuple[str, bytes]) -> bool:
+        path, data = item
         try:
-            with open(filepath, mode) as f:
-                f.write('\n'.join(proxies) + '\n')
-        except Exception as e:
-            logger.error(f"Error writing proxies to {filepath}: {e}")
+            # Only the digest of the old content is compared, the file is never parsed
+            if file_digest(path) == hashlib.sha256(data).digest():
+                return False
+            write_atomically(path, data, fsync=False)
+            return True
+        except OSError as e:
+            logger.error(f"Error writing proxies to {path}: {e}")
+            return False
@@ -0,0 +1,239 @@
+import atexit
+import logging
+import os
+import struct
+import threading
+from array import array
+from functools import lru_cache
+from typing import Dict, Iterable, List, Set
+
+from proxy_scraper.config import CONFIG
+from proxy_scraper.parser import iter_records
+from proxy_scraper.protocol import Protocol
+from proxy_scraper.proxy import Proxy, ip_to_int
+from proxy_scraper.proxy_batch import PROTOCOL_CODES, ProxyBatch, proxy_key
+from proxy_scraper.util.files import write_atomically
+
+logger = logging.getLogger(__name__)
+
+RAW_STORE_CONFIG = CONFIG.get('raw_store', {})
+# Compact a list once this share of its lines are duplicates or unparsable
+COMPACT_RATIO = RAW_STORE_CONFIG.get('compact_ratio', 0.1)
+
+INDEX_SUFFIX = '.idx'
+PROTOCOL_NAMES = {protocol.value for protocol in Protocol}
+# Format tag, size and mtime of the list when the index was written, its number of lines and
+# the number of packed keys that follow. An index that does not match is rebuilt from the list
+INDEX_MAGIC = b'PXI2'
+INDEX_HEADER = struct.Struct('<4sQQQQ')
+
+
+class RawProxyFile:
+    """One append-only raw list, e.g. proxies/raw/http.txt, and the set of proxies it holds.
+
+    The keys are kept in memory and in an index file next to the list, which records the
+    size, mtime and line count of the list it covers, so a later run only parses a list
+    that changed and still knows how many of its lines are stale.
+    Every batch is appended with a single write followed by fsync; a line torn by a crash
+    is cut off the next time the list is loaded, and compaction replaces the list through
+    a temporary file and a rename.
+    """
+
+    def __init__(self, path: str, protocol: str):
+        self.path = path
+        self.index_path = path + INDEX_SUFFIX
+        self.protocol = Protocol(protocol)
+        self.keys: Set[int] = set()
+        self.lines = 0
+        self._load()
+
+    def _load(self):
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        offset = self._load_index(size)
+        if offset < size:
+            with open(self.path, 'rb') as f:
+                f.seek(offset)
+                tail = f.read()
+            complete = tail.rfind(b'\n') + 1
+            if complete < len(tail):
+                logger.warning(f"Dropping incomplete last line of {self.path}")
+                os.truncate(self.path, offset + complete)
+            self._index_lines(tail[:complete].decode('utf-8', errors='ignore').splitlines())
+        logger.debug(f"Loaded {len(self.keys)} proxies from {self.path}")
+
+    def _load_index(self, size: int) -> int:
+        try:
+            with open(self.index_path, 'rb') as f:
+                data = f.read()
+            magic, indexed_size, mtime, lines, count = INDEX_HEADER.unpack_from(data)
+        except (OSError, struct.error):
+            return 0
+        keys = array('Q')
+        if magic != INDEX_MAGIC or len(data) != INDEX_HEADER.size + count * keys.itemsize:
+            logger.info(f"Rebuilding the unreadable index of {self.path}")
+            return 0
+        # Any change since the index was saved (a crash after an append, a checkout, a manual
+        # edit) invalidates it, even one that only made the list longer
+        if indexed_size != size or mtime != os.stat(self.path).st_mtime_ns:
+            return 0
+        keys.frombytes(data[INDEX_HEADER.size:])
+        self.keys = set(keys)
+        self.lines = lines
+        return indexed_size
+
+    def _index_lines(self, lines: List[str]):
+        # Same key as proxy_key(Proxy.from_record(...)), without building a Proxy per line
+        codes = {protocol.value: code for protocol, code in PROTOCOL_CODES.items()}
+        default_code = PROTOCOL_CODES[self.protocol]
+        add = self.keys.add
+        for host, port, protocol, *_ in iter_records(lines):
+            try:
+                add((ip_to_int(host) << 24) | (port << 8) | (codes[protocol] if protocol else default_code))
+            except (ValueError, KeyError):
+                pass
+        self.lines += len(lines)
+
+    @property
+    def stale_lines(self) -> int:
+        return self.lines - len(self.keys)
+
+    def __contains__(self, proxy: Proxy) -> bool:
+        return proxy_key(proxy) in self.keys
+
+    def append(self, batch: ProxyBatch) -> int:
+        keys = self.keys
+        rows = []
+        for row, key in enumerate(batch.keys()):
+            if key not in keys:
+                keys.add(key)
+                rows.append(row)
+        if not rows:
+            return 0
+
+        data = ''.join(f"{address}\n" for address in batch.take(rows).addresses()).encode()
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        self.lines += len(rows)
+        return len(rows)
+
+    def compact(self):
+        """Rewrite the list without duplicate or unparsable lines, keeping the first occurrence."""
+        if not os.path.exists(self.path):
+            return
+        seen = set()
+        kept = []
+        with open(self.path, 'r', errors='ignore') as f:
+            for line in f:
+                record = next(iter_records([line]), None)
+                if record is None:
+                    continue
+                try:
+                    key = proxy_key(Proxy.from_record(record, self.protocol))
+                except ValueError:
+                    continue
+                if key not in seen:
+                    seen.add(key)
+                    kept.append(line if line.endswith('\n') else line + '\n')
+
+        write_atomically(self.path, ''.join(kept).encode())
+        logger.info(f"Compacted {self.path}: {self.lines - len(kept)} stale lines removed, {len(kept)} kept")
+        self.keys = seen
+        self.lines = len(kept)
+        self.save_index()
+
+    def save_index(self):
+        if not os.path.exists(self.path):
+            return
+        stat = os.stat(self.path)
+        keys = array('Q', self.keys)
+        header = INDEX_HEADER.pack(INDEX_MAGIC, stat.st_size, stat.st_mtime_ns, self.lines, len(keys))
+        write_atomically(self.index_path, header + keys.tobytes())
+
+
+class RawProxyStore:
+    """Single writer for a raw directory: every append for a list goes through one RawProxyFile.
+
+    Use ``get_raw_store`` so that all writers in the process share the same instance.
+    """
+
+    def __init__(self, directory: str, compact_ratio: float = COMPACT_RATIO):
+        self.directory = directory
+        self.compact_ratio = compact_ratio
+        self.files: Dict[str, RawProxyFile] = {}
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def _file(self, protocol: str) -> RawProxyFile:
+        raw_file = self.files.get(protocol)
+        if raw_file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            raw_file = RawProxyFile(os.path.join(self.directory, f'{protocol}.txt'), protocol)
+            self.files[protocol] = raw_file
+        return raw_file
+
+    def add(self, proxies: Iterable[Proxy]) -> int:
+        """Append the proxies that are not in the lists yet; returns how many were added."""
+        batch = ProxyBatch.from_proxies(proxies).unique()
+        added = 0
+        with self._lock:
+            for protocol, group in batch.group_by_protocol().items():
+                raw_file = self._file(protocol)
+                count = raw_file.append(group.sorted())
+                added += count
+                logger.info(f"Added {count} new {protocol} proxies to {raw_file.path}")
+        return added
+
+    def __contains__(self, proxy: Proxy) -> bool:
+        with self._lock:
+            return proxy in self._file(proxy.protocol)
+
+    def _all_files(self) -> List[RawProxyFile]:
+        """Every list in the directory, loaded from its index where that is still valid."""
+        if not os.path.isdir(self.directory):
+            return []
+        protocols = (filename[:-len('.txt')] for filename in sorted(os.listdir(self.directory)))
+        return [self._file(protocol) for protocol in protocols if protocol in PROTOCOL_NAMES]
+
+    def count(self) -> int:
+        """Number of distinct proxies in all lists of the directory, read from their indexes."""
+        with self._lock:
+            return sum(len(raw_file.keys) for raw_file in self._all_files())
+
+    def keys(self) -> array:
+        """Packed keys (see proxy_key) of every proxy in the lists of the directory."""
+        keys = array('Q')
+        with self._lock:
+            for raw_file in self._all_files():
+                keys.extend(raw_file.keys)
+        return keys
+
+    def compact(self) -> int:
+        """Compact the lists that have accumulated too many stale lines; returns how many were rewritten."""
+        compacted = 0
+        with self._lock:
+            for raw_file in self._all_files():
+                if raw_file.lines and raw_file.stale_lines / raw_file.lines > self.compact_ratio:
+                    raw_file.compact()
+                    compacted += 1
+        return compacted
+
+    def flush(self):
+        """Persist the indexes. Lists are only rewritten by ``compact``, which scraping calls when it is done."""
+        with self._lock:
+            for raw_file in self.files.values():
+                raw_file.save_index()
+
+
+@lru_cache(maxsize=None)
+def _store_for(directory: str) -> RawProxyStore:
+    return RawProxyStore(directory)
+
+
+def get_raw_store(directory: str) -> RawProxyStore:
+    return _store_for(os.path.abspath(directory))
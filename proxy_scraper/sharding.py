@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import multiprocessing
+import queue
+import traceback
+from typing import AsyncIterator, List, NamedTuple, Optional, Tuple
+
+from proxy_scraper.config import CONFIG
+from proxy_scraper.dedup import ProxyDeduplicator, mix_key
+from proxy_scraper.proxy import Proxy, ProxyTiming
+from proxy_scraper.proxy_batch import ProxyBatch, proxy_key
+from proxy_scraper.proxy_file_manager import RAW_DIR, ProxyFileManager
+from proxy_scraper.proxy_health import HEALTH_CONFIG, ProxyHealthStore
+from proxy_scraper.proxy_validator import ProxyValidator
+from proxy_scraper.util.aio import join_processes
+
+logger = logging.getLogger(__name__)
+
+SHARDING_CONFIG = CONFIG.get('sharding', {})
+# _validate_shard puts its pending ProxyBatch on the results queue once it has this many
+# proxies, and every RESULT_INTERVAL seconds
+RESULT_BATCH_SIZE = SHARDING_CONFIG.get('result_batch_size', 500)
+RESULT_INTERVAL = SHARDING_CONFIG.get('result_interval', 1)
+# maxsize of the multiprocessing results queue
+RESULT_QUEUE_SIZE = SHARDING_CONFIG.get('result_queue_size', 64)
+# How often the parent checks that workers which have not finished are still alive
+POLL_INTERVAL = 1
+
+# Sent by a worker, with its shard index, once it has sent all of its results
+DONE = None
+
+
+class ShardFailure(NamedTuple):
+    """Sent by a worker, with its shard index, instead of DONE when validating its shard raised."""
+
+    error: str
+
+
+def shard_of(proxy: Proxy, shards: int) -> int:
+    # Packed keys end in the protocol code, so they are mixed before taking the remainder
+    return mix_key(proxy_key(proxy)) % shards
+
+
+class ShardedValidator:
+    """Validates the raw lists in ``workers`` processes, each with its own event loop.
+
+    A single loop is bound by one core, which it spends on TLS handshakes, response
+    parsing and logging. Every worker streams the raw lists itself and keeps only its own
+    shard, picked by a hash of (ip, port, protocol), so the shards are disjoint, duplicates
+    always meet in the same worker, and nothing but results crosses process boundaries.
+    Each worker runs a ProxyValidator with the configured limits (the total concurrency
+    is ``workers`` times the per-process one) and records its checks in the shared
+    health database. Valid proxies are sent back in batches through a bounded queue;
+    ``iter_valid`` yields them in the parent, which stays the only writer of the lists.
+    A shard that fails or a worker that dies makes ``iter_valid`` raise RuntimeError,
+    since its share of the proxies would otherwise be missing from the lists.
+    """
+
+    def __init__(self, workers: int, directory: str = RAW_DIR, log_level: Optional[int] = None):
+        self.workers = workers
+        self.directory = directory
+        self.log_level = logging.getLogger().level if log_level is None else log_level
+
+    async def iter_valid(self) -> AsyncIterator[Tuple[Proxy, ProxyTiming]]:
+        # Spawned rather than forked: the parent already runs threads and an event loop
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue(maxsize=RESULT_QUEUE_SIZE)
+        processes = [
+            context.Process(
+                target=_run_shard,
+                args=(index, self.workers, self.directory, results, self.log_level),
+                name=f'validator-{index}',
+                daemon=True,
+            )
+            for index in range(self.workers)
+        ]
+        for process in processes:
+            process.start()
+        logger.info(f"Started {self.workers} validator processes")
+
+        try:
+            async for batch in self._receive(results, processes):
+                for row, proxy in enumerate(batch):
+                    yield proxy, batch.timings.get(row)
+        finally:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+            await asyncio.to_thread(join_processes, processes)
+
+    async def _receive(self, results, processes: List) -> AsyncIterator[ProxyBatch]:
+        pending = set(range(len(processes)))
+        # Workers seen exited at the previous poll; their last messages may still have been in flight
+        exited = set()
+        while pending:
+            try:
+                index, batch = await asyncio.to_thread(results.get, timeout=POLL_INTERVAL)
+            except queue.Empty:
+                for index in list(pending):
+                    if processes[index].exitcode is None:
+                        continue
+                    if index in exited:
+                        raise RuntimeError(
+                            f"Validator process {index} exited with code {processes[index].exitcode} "
+                            f"before finishing its shard"
+                        )
+                    exited.add(index)
+                continue
+            if batch is DONE:
+                pending.discard(index)
+            elif isinstance(batch, ShardFailure):
+                logger.error(f"Validating shard {index} failed:\n{batch.error}")
+                raise RuntimeError(f"Validating shard {index} failed")
+            else:
+                yield batch
+
+
+def _run_shard(index: int, shards: int, directory: str, results, log_level: int):
+    logging.basicConfig(level=log_level, format=f'%(asctime)s - shard {index} - %(levelname)s - %(message)s')
+    try:
+        asyncio.run(_validate_shard(index, shards, directory, results))
+    except BaseException:
+        results.put((index, ShardFailure(traceback.format_exc())))
+        raise
+    results.put((index, DONE))
+
+
+async def _validate_shard(index: int, shards: int, directory: str, results):
+    health_store = ProxyHealthStore() if HEALTH_CONFIG.get('enabled', True) else None
+    validator = ProxyValidator(health_store=health_store)
+    deduplicator = ProxyDeduplicator()
+
+    async def shard():
+        async for proxy in ProxyFileManager.aiter_proxies_from_raw_directory(directory):
+            if shard_of(proxy, shards) == index and deduplicator.is_new(proxy):
+                yield proxy
+
+    batch = ProxyBatch()
+    send_lock = asyncio.Lock()
+
+    async def send():
+        nonlocal batch
+        if not batch:
+            return
+        sending, batch = batch, ProxyBatch()
+        async with send_lock:
+            # Waits while the parent is behind, without stalling the checks in flight
+            await asyncio.to_thread(results.put, (index, sending))
+
+    async def send_periodically():
+        # Valid proxies can arrive far apart, so a partial batch must not wait for the next one
+        while True:
+            await asyncio.sleep(RESULT_INTERVAL)
+            await send()
+
+    sender = asyncio.create_task(send_periodically())
+    try:
+        async for proxy, timing in validator.iter_valid(shard()):
+            batch.append(proxy, timing)
+            if len(batch) >= RESULT_BATCH_SIZE:
+                await send()
+    finally:
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
+    await send()
+    logger.info(f"Shard {index}/{shards} finished, {deduplicator.duplicates} duplicates dropped")
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import ssl
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, Dict, Optional
+
+import certifi
+from aiohttp import BasicAuth, ClientResponse, ClientSession, ClientTimeout, TCPConnector, TraceConfig
+from aiohttp.resolver import AsyncResolver
+from aiohttp_socks import ProxyConnector, ProxyType
+
+from proxy_scraper.config import CONFIG
+
+VALIDATE_URL = CONFIG['validate_url']
+TIMEOUT = CONFIG['timeout']
+DNS_CACHE_TTL = 300
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def get_ssl_context() -> ssl.SSLContext:
+    return ssl.create_default_context(cafile=certifi.where())
+
+
+@lru_cache(maxsize=None)
+def get_headers() -> dict:
+    # fake_useragent loads its browser database when constructed, so wait until a request needs it
+    from fake_useragent import UserAgent
+
+    return {'User-Agent': UserAgent().random}
+
+
+async def load_headers() -> dict:
+    """get_headers() for code on the event loop: the first call reads fake_useragent's database in a thread."""
+    return await asyncio.to_thread(get_headers)
+
+
+# Request tracing fills the dict passed as ``trace`` to ValidationTransport.request with
+# perf_counter timestamps: when the request started, when the connection through the
+# proxy was ready (TCP, proxy handshake and TLS) and when the response headers arrived.
+async def _on_request_start(session, context, params):
+    if context.trace_request_ctx is not None:
+        context.trace_request_ctx.setdefault('started', time.perf_counter())
+
+
+async def _on_connection_create_end(session, context, params):
+    if context.trace_request_ctx is not None:
+        context.trace_request_ctx['connected'] = time.perf_counter()
+
+
+async def _on_request_end(session, context, params):
+    if context.trace_request_ctx is not None:
+        context.trace_request_ctx['first_byte'] = time.perf_counter()
+
+
+def _timing_trace_config() -> TraceConfig:
+    trace_config = TraceConfig()
+    trace_config.on_request_start.append(_on_request_start)
+    trace_config.on_connection_create_end.append(_on_connection_create_end)
+    trace_config.on_request_end.append(_on_request_end)
+    return trace_config
+
+
+class ValidationTransport:
+    """Session machinery shared by every proxy check in a validation run.
+
+    HTTP and HTTPS proxies are checked through one long-lived session with a
+    per-request ``proxy=``; SOCKS proxies still need a connector of their own,
+    but share the resolver, SSL context and timeout with everything else.
+    """
+
+    def __init__(self, timeout: int = TIMEOUT):
+        self.timeout = ClientTimeout(total=timeout)
+        self.resolver: Optional[AsyncResolver] = None
+        self.session: Optional[ClientSession] = None
+        self.headers: Optional[dict] = None
+        self.trace_config = _timing_trace_config()
+
+    async def open(self):
+        if self.session is not None:
+            return
+        # Before any check starts, so the workers never wait for the User-Agent database
+        self.headers = await load_headers()
+        self.resolver = AsyncResolver()
+        # Every check goes to a different proxy, so idle keep-alive sockets would
+        # never be reused and only pile up file descriptors.
+        connector = TCPConnector(
+            limit=0,
+            ssl=get_ssl_context(),
+            resolver=self.resolver,
+            ttl_dns_cache=DNS_CACHE_TTL,
+            force_close=True,
+        )
+        self.session = ClientSession(
+            connector=connector,
+            headers=self.headers,
+            timeout=self.timeout,
+            raise_for_status=True,
+            trace_configs=[self.trace_config],
+        )
+        logger.debug("Opened shared validation transport")
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        if self.resolver is not None:
+            await self.resolver.close()
+            self.resolver = None
+        logger.debug("Closed shared validation transport")
+
+    async def __aenter__(self) -> 'ValidationTransport':
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    @asynccontextmanager
+    async def request(
+        self, proxy, url: str = VALIDATE_URL, trace: Optional[Dict[str, float]] = None
+    ) -> AsyncIterator[ClientResponse]:
+        if self.session is None:
+            await self.open()
+
+        if proxy.protocol in ('http', 'https'):
+            proxy_auth = BasicAuth(proxy.username, proxy.password or '') if proxy.username else None
+            async with self.session.get(
+                url, proxy=f"http://{proxy.host}:{proxy.port}", proxy_auth=proxy_auth, trace_request_ctx=trace
+            ) as response:
+                yield response
+            return
+
+        connector = ProxyConnector(
+            proxy_type=ProxyType[proxy.protocol.upper()],
+            host=proxy.host,
+            port=int(proxy.port),
+            username=proxy.username or None,
+            password=proxy.password or None,
+            ssl=get_ssl_context(),
+            resolver=self.resolver,
+            force_close=True,
+        )
+        async with ClientSession(
+            connector=connector,
+            headers=self.headers,
+            timeout=self.timeout,
+            raise_for_status=True,
+            trace_configs=[self.trace_config],
+        ) as session:
+            async with session.get(url, trace_request_ctx=trace) as response:
+                yield response
@@ -0,0 +1,22 @@
+import hashlib
+import os
+from typing import Optional
+
+
+def write_atomically(path: str, data: bytes, fsync: bool = True):
+    """Replace ``path`` with ``data`` so that readers see either the old or the new content."""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def file_digest(path: str) -> Optional[bytes]:
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).digest()
+    except FileNotFoundError:
+        return None
@@ -1,43 +1,70 @@
 import logging
 import os
 import random
-import time
+import threading
 from functools import lru_cache
-from typing import Optional
+from typing import Dict, Iterable, List, Optional
 
 import geoip2.database
 import pycountry
 import requests
 
+from proxy_scraper.config import CONFIG
+from proxy_scraper.util.aio import io_thread
+from proxy_scraper.util.geo_api import (
+    API_URL,
+    FALLBACK_API,
+    GEO_NAMES_USERNAMES,
+    GeoApiClient,
+    format_api_data,
+    unresolved_region,
+)
 from proxy_scraper.util.geo_db import GeoDB
+from proxy_scraper.util.xdbSearcher import MmapXdbSearcher
 
 logger = logging.getLogger(__name__)
 
-GEO_NAMES_USERNAMES = ['no13bus', 'no10bus']
 DB_URL = "https://mirror.ghproxy.com/https://github.com/P3TERX/GeoLite.mmdb/raw/download/GeoLite2-Country.mmdb"
 DB_PATH = "GeoLite2-Country.mmdb"
-API_URL = "http://ip-api.com/json/{}"
-FALLBACK_API = "https://ipapi.co/{}/json"
-RETRY_WAIT_TIME = 45
+XDB_PATH = CONFIG.get('geo', {}).get('xdb_path', "ip2region.xdb")
 
 class GeoInfo:
-    def __init__(self, db_path=DB_PATH):
+    def __init__(self, db_path=DB_PATH, xdb_path=XDB_PATH):
         self.db_path = db_path
+        self.xdb_path = xdb_path
         self.geonames_usernames = GEO_NAMES_USERNAMES
         self.reader = None
+        self.xdb = None
         self.db = GeoDB()
+        self.api = GeoApiClient()
         self._init_reader()
+        self._init_xdb()
 
     def _init_reader(self):
-        if not os.path.exists(self.db_path):
-            logger.info(f"Database file {self.db_path} not found, downloading...")
-            self._download_db(self.db_path)
+        # Without GeoLite2 the cache and xdb still answer, so a failed download is not fatal
         try:
+            if not os.path.exists(self.db_path):
+                logger.info(f"Database file {self.db_path} not found, downloading...")
+                self._download_db(self.db_path)
             self.reader = geoip2.database.Reader(self.db_path)
             logger.info(f"Initialized GeoLite2 Reader with database path {self.db_path}")
         except Exception as e:
-            logger.error(f"Failed to initialize GeoLite2 Reader: {e}")
-            raise RuntimeError(f"Failed to initialize GeoLite2 Reader: {e}")
+            logger.error(f"GeoLite2 unavailable, resolving from the cache and xdb only: {e}")
+
+    @property
+    def complete(self) -> bool:
+        """Whether GeoLite2 is loaded. Without it many IPs stay unresolved, so country lists are incomplete."""
+        return self.reader is not None
+
+    def _init_xdb(self):
+        # Optional offline provider, consulted when GeoLite2 has no answer before any HTTP API
+        if not os.path.exists(self.xdb_path):
+            logger.debug(f"ip2region database {self.xdb_path} not found, offline xdb lookups disabled")
+            return
+        try:
+            self.xdb = MmapXdbSearcher(self.xdb_path)
+        except Exception as e:
+            logger.error(f"Failed to initialize xdb searcher: {e}")
 
     def _download_db(self, path):
         try:
@@ -74,8 +101,11 @@ class GeoInfo:
         except LookupError:
             return None
 
+    def _is_chinese(self, name: str) -> bool:
+        return any('\u4e00' <= char <= '\u9fff' for char in name)
+
     def get_country_code(self, name: str) -> Optional[str]:
-        if any('\u4e00' <= char <= '\u9fff' for char in name):
+        if self._is_chinese(name):
             country_code = self._translate_country_name(name)
         else:
             country_code = self._get_country_code_from_pycountry(name)
@@ -87,9 +117,10 @@ class GeoInfo:
             return None
 
     def get_region(self, ip: str) -> dict:
+        # Blocking: may query HTTP APIs with requests. Code running in the event loop should use resolve_many.
         cached_data = self.db.get(ip)
         if cached_data:
-            logger.info(f"Cache hit for IP: {ip}")
+            logger.debug(f"Cache hit for IP: {ip}")
             return cached_data
 
         try:
@@ -100,7 +131,84 @@ class GeoInfo:
             return region_info
         except Exception as e:
             logger.error(f"Error fetching region data for IP {ip}: {e}")
-            return self._fetch_from_api(ip)
+
+        region_info = self._query_xdb(ip)
+        if region_info:
+            self.db.set(ip, region_info)
+            return region_info
+        return self._fetch_from_api(ip)
+
+    async def resolve_many(self, ips: Iterable[str]) -> Dict[str, dict]:
+        """Resolve the region of many IPs at once.
+
+        Each distinct IP is looked up once: cache hits are served in bulk, the rest go
+        through GeoLite2 and the xdb database in one pass each, and only what is still
+        unknown is sent to the rate-limited HTTP fallback. New results are cached in a
+        single write. IPs that cannot be resolved are missing from the result, except
+        those the HTTP API has no region for: they get an empty country, which is cached
+        like any other answer so they are not queried again. Without GeoLite2 (see
+        ``complete``) only the cache and xdb are consulted. The database reads and
+        writes run on the I/O thread.
+        """
+        pending = list(dict.fromkeys(ips))
+        regions = await io_thread.run(self.db.get_many, pending)
+        pending = [ip for ip in pending if ip not in regions]
+        logger.info(f"Resolving regions: {len(regions)} cached, {len(pending)} to look up")
+
+        resolved = {}
+        if pending and self.complete:
+            resolved.update(await io_thread.run(self._query_geoip2_many, pending))
+            pending = [ip for ip in pending if ip not in resolved]
+        if pending:
+            resolved.update(await self._query_xdb_many(pending))
+            pending = [ip for ip in pending if ip not in resolved]
+
+        # Without GeoLite2 every uncached IP would end up here, far beyond the API quotas
+        if pending and self.complete:
+            logger.info(f"Looking up {len(pending)} IPs with the HTTP fallback")
+            resolved.update(await self.api.lookup_many(pending))
+
+        if resolved:
+            await io_thread.run(self.db.set_many, list(resolved.values()))
+        regions.update(resolved)
+        return regions
+
+    def _query_geoip2_many(self, ips: List[str]) -> Dict[str, dict]:
+        found = {}
+        country = self.reader.country
+        for ip in ips:
+            try:
+                response = country(ip)
+            except Exception as e:
+                logger.debug(f"GeoLite2 query failed for IP {ip}: {e}")
+                continue
+            if response.country.iso_code:
+                found[ip] = {
+                    "ip": ip,
+                    "country": response.country.name,
+                    "countryCode": response.country.iso_code,
+                }
+        return found
+
+    async def _query_xdb_many(self, ips: List[str]) -> Dict[str, dict]:
+        if self.xdb is None:
+            return {}
+        try:
+            regions = await io_thread.run(self.xdb.search_many, ips)
+        except Exception as e:
+            logger.error(f"xdb batch query failed: {e}")
+            return {}
+
+        countries = {ip: self._xdb_country(region) for ip, region in zip(ips, regions)}
+        names = {country for country in countries.values() if country}
+        codes = await self.api.translate_country_names(name for name in names if self._is_chinese(name))
+        codes.update({name: self._get_country_code_from_pycountry(name) for name in names if name not in codes})
+
+        found = {}
+        for ip, country in countries.items():
+            if country and codes.get(country):
+                found[ip] = {"ip": ip, "country": country, "countryCode": codes[country]}
+        return found
 
     def _query_geoip2(self, ip: str) -> dict:
         try:
@@ -116,6 +224,33 @@ class GeoInfo:
             logger.error(f"GeoLite2 query failed for IP {ip}: {e}")
             raise RuntimeError(f"GeoLite2 query failed for IP {ip}: {e}")
 
+    def _query_xdb(self, ip: str) -> Optional[dict]:
+        if self.xdb is None:
+            return None
+        try:
+            return self._format_xdb_region(ip, self.xdb.searchByIPStr(ip))
+        except Exception as e:
+            logger.error(f"xdb query failed for IP {ip}: {e}")
+            return None
+
+    def _xdb_country(self, region: str) -> Optional[str]:
+        # ip2region regions look like "国家|区域|省份|城市|ISP", with "0" for unknown parts
+        country = region.split('|', 1)[0]
+        return country if country and country != '0' else None
+
+    def _format_xdb_region(self, ip: str, region: str) -> Optional[dict]:
+        country = self._xdb_country(region)
+        if not country:
+            return None
+        country_code = self.get_country_code(country)
+        if not country_code:
+            return None
+        return {
+            "ip": ip,
+            "country": country,
+            "countryCode": country_code,
+        }
+
     def _fetch_from_api(self, ip: str) -> dict:
         try:
             region_info = self._request_api(ip, API_URL)
@@ -127,36 +262,51 @@ class GeoInfo:
                 raise Exception(region_info.get("message"))
 
             region_info = self._format_api_data(ip, region_info)
-            self.ip_cache.set(ip, region_info)
+            self.db.set(ip, region_info)
             return region_info
         except Exception as e:
             logger.error(f"Failed to fetch data from API for IP {ip}: {e}")
-            return {"ip": ip, "country": "", "countryCode": ""}
+            return unresolved_region(ip)
 
     def _request_api(self, ip: str, url: str) -> dict:
-        response = requests.get(url.format(ip))
-        data = response.json()
-
-        if data.get("status") == "fail" and url == API_URL:
-            logger.warning(
-                f"Request failed for IP {ip}. Status: {data.get('message')}. Retrying after {RETRY_WAIT_TIME} seconds."
-            )
-            time.sleep(RETRY_WAIT_TIME)
-            response = requests.get(url.format(ip))
-            data = response.json()
-
-        return data
+        # No sleep-and-retry here: a failed ip-api lookup falls through to FALLBACK_API right away
+        response = requests.get(url.format(ip), timeout=10)
+        return response.json()
 
     def _format_api_data(self, ip: str, data: dict) -> dict:
-        country = data.get("country")
-        country_code = data.get("countryCode", data.get("country_code"))
-        return {
-            "ip": ip,
-            "country": country,
-            "countryCode": country_code,
-        }
+        return format_api_data(ip, data)
+
+
+class LazyGeoInfo:
+    """Shared GeoInfo that is only built on first use.
+
+    Building a GeoInfo opens the sqlite cache and downloads the GeoLite2 database when it
+    is missing, so importing this module must not do it. Attribute access is forwarded to
+    the instance, created on demand; call ``warm_up`` to pay that cost at a chosen moment.
+    """
+
+    def __init__(self, factory=GeoInfo):
+        self._factory = factory
+        self._instance: Optional[GeoInfo] = None
+        self._lock = threading.Lock()
+
+    @property
+    def initialized(self) -> bool:
+        return self._instance is not None
+
+    def warm_up(self) -> GeoInfo:
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    logger.info("Initializing geo lookups")
+                    self._instance = self._factory()
+        return self._instance
+
+    def __getattr__(self, name):
+        return getattr(self.warm_up(), name)
+
 
-geo_info = GeoInfo()
+geo_info = LazyGeoInfo()
 
 # if __name__ == "__main__":
 #     logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
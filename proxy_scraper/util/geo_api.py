@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, Iterable, List, Optional
+
+from aiohttp import ClientError, ClientSession, ClientTimeout
+
+logger = logging.getLogger(__name__)
+
+API_URL = "http://ip-api.com/json/{}"
+BATCH_API_URL = "http://ip-api.com/batch?fields=status,message,country,countryCode,query"
+FALLBACK_API = "https://ipapi.co/{}/json"
+GEONAMES_URL = "http://api.geonames.org/searchJSON"
+GEO_NAMES_USERNAMES = ['no13bus', 'no10bus']
+
+# ip-api's free quotas: 45 single lookups or 15 batch requests of up to 100 IPs per minute
+BATCH_REQUESTS_PER_MINUTE = 15
+BATCH_SIZE = 100
+FALLBACK_REQUESTS_PER_MINUTE = 30
+FAILURE_THRESHOLD = 3
+RESET_TIMEOUT = 60
+TIMEOUT = 10
+
+
+class TokenBucket:
+    """Allows ``capacity`` requests at once, refilled at ``rate`` tokens per second."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        async with self._lock:
+            self._refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+    def drain(self, seconds: float):
+        """Empty the bucket so the next token is only available after ``seconds``."""
+        self._refill()
+        self.tokens = min(self.tokens, -seconds * self.rate + 1)
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures and lets one attempt through
+    again once ``reset_timeout`` seconds have passed."""
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        if self.opened_at is None:
+            return False
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            # Half-open: allow a trial request, a single failure re-opens the breaker
+            self.opened_at = None
+            self.failures = self.failure_threshold - 1
+            return False
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold and self.opened_at is None:
+            self.opened_at = time.monotonic()
+            logger.warning(f"Geo API circuit opened after {self.failures} failures")
+
+
+class GeoApiClient:
+    """Asynchronous HTTP fallback for IPs that no local database could place.
+
+    IPs are sent to ip-api's batch endpoint in chunks of up to 100, paced by a token
+    bucket that matches its quota and backs off when the rate limit headers say the
+    window is used up. Repeated failures open a circuit breaker, during which lookups
+    go to ipapi.co one IP at a time; so do the IPs of a batch request that failed. IPs
+    the batch endpoint answers with ``fail`` (private or reserved ranges) are returned
+    with an empty country, so that the cache remembers them and they are not queried
+    again. All endpoints can be overridden, e.g. to point the client at a local stub server.
+    """
+
+    def __init__(
+        self,
+        batch_url: str = BATCH_API_URL,
+        fallback_url: str = FALLBACK_API,
+        geonames_url: str = GEONAMES_URL,
+        batch_requests_per_minute: int = BATCH_REQUESTS_PER_MINUTE,
+        fallback_requests_per_minute: int = FALLBACK_REQUESTS_PER_MINUTE,
+        batch_size: int = BATCH_SIZE,
+        breaker: Optional[CircuitBreaker] = None,
+        timeout: int = TIMEOUT,
+    ):
+        self.batch_url = batch_url
+        self.fallback_url = fallback_url
+        self.geonames_url = geonames_url
+        self.batch_size = batch_size
+        self.batch_bucket = TokenBucket(batch_requests_per_minute / 60, batch_requests_per_minute)
+        self.fallback_bucket = TokenBucket(fallback_requests_per_minute / 60, 1)
+        self.breaker = breaker or CircuitBreaker()
+        self.timeout = ClientTimeout(total=timeout)
+        self.country_codes: Dict[str, Optional[str]] = {}
+
+    async def lookup_many(self, ips: Iterable[str]) -> Dict[str, dict]:
+        ips = list(ips)
+        results = {}
+        async with ClientSession(timeout=self.timeout) as session:
+            for start in range(0, len(ips), self.batch_size):
+                chunk = ips[start:start + self.batch_size]
+                answered = None if self.breaker.is_open else await self._lookup_batch(session, chunk)
+                if answered is not None:
+                    results.update(answered)
+                    continue
+                for ip in chunk:
+                    data = await self._lookup_fallback(session, ip)
+                    if data:
+                        results[ip] = data
+        return results
+
+    async def _lookup_batch(self, session: ClientSession, ips: List[str]) -> Optional[Dict[str, dict]]:
+        # None when the request failed; an IP missing from the answer is looked up again next time
+        await self.batch_bucket.acquire()
+        try:
+            async with session.post(self.batch_url, json=ips) as response:
+                self._respect_rate_limit(response.headers)
+                if response.status != 200:
+                    raise ClientError(f"HTTP {response.status}")
+                rows = await response.json(content_type=None)
+        except (ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.error(f"Geo batch request for {len(ips)} IPs failed: {e}")
+            self.breaker.record_failure()
+            return None
+
+        self.breaker.record_success()
+        found = {}
+        for data in rows:
+            ip = data.get("query")
+            if not ip:
+                continue
+            if data.get("status") == "success":
+                found[ip] = format_api_data(ip, data)
+            elif data.get("status") == "fail":
+                logger.debug(f"Geo API has no region for IP {ip}: {data.get('message')}")
+                found[ip] = unresolved_region(ip)
+        return found
+
+    def _respect_rate_limit(self, headers):
+        # ip-api reports the requests left in the window (X-Rl) and seconds until it resets (X-Ttl)
+        remaining, ttl = headers.get("X-Rl"), headers.get("X-Ttl")
+        if remaining == "0" and ttl and ttl.isdigit():
+            logger.warning(f"Geo API rate limit reached, pausing batch requests for {ttl}s")
+            self.batch_bucket.drain(int(ttl))
+
+    async def _lookup_fallback(self, session: ClientSession, ip: str) -> Optional[dict]:
+        await self.fallback_bucket.acquire()
+        try:
+            async with session.get(self.fallback_url.format(ip)) as response:
+                data = await response.json(content_type=None)
+        except (ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.error(f"Fallback geo request for IP {ip} failed: {e}")
+            return None
+        if data.get("error") or data.get("status") == "fail":
+            logger.error(f"Failed to fetch data from API for IP {ip}: {data}")
+            return None
+        return format_api_data(ip, data)
+
+    async def translate_country_names(self, names: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Map (e.g. Chinese) country names to ISO codes through GeoNames, caching every answer."""
+        names = list(names)
+        pending = [name for name in dict.fromkeys(names) if name not in self.country_codes]
+        if pending:
+            async with ClientSession(timeout=self.timeout) as session:
+                for name in pending:
+                    self.country_codes[name] = await self._translate_country_name(session, name)
+        return {name: self.country_codes.get(name) for name in names}
+
+    async def _translate_country_name(self, session: ClientSession, name: str) -> Optional[str]:
+        params = {"q": name, "maxRows": 1, "username": random.choice(GEO_NAMES_USERNAMES)}
+        try:
+            async with session.get(self.geonames_url, params=params) as response:
+                response.raise_for_status()
+                data = await response.json(content_type=None)
+        except (ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.error(f"Error translating country name '{name}' using GeoNames: {e}")
+            return None
+        if data.get('geonames'):
+            return data['geonames'][0].get('countryCode')
+        return None
+
+
+def unresolved_region(ip: str) -> dict:
+    """Region of an IP that the APIs cannot place; cached so the IP is not looked up again."""
+    return {"ip": ip, "country": "", "countryCode": ""}
+
+
+def format_api_data(ip: str, data: dict) -> dict:
+    # ipapi.co puts the code in "country" and the name in "country_name"
+    country = data.get("country_name") or data.get("country")
+    country_code = data.get("countryCode", data.get("country_code"))
+    return {
+        "ip": ip,
+        "country": country,
+        "countryCode": country_code,
+    }
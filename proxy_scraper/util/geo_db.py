@@ -1,48 +1,118 @@
+import atexit
 import logging
-import os
 import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
 
 logger = logging.getLogger(__name__)
 
+# Stay below SQLITE_MAX_VARIABLE_NUMBER of older sqlite builds
+QUERY_CHUNK_SIZE = 500
+
+
 class GeoDB:
+    """sqlite-backed cache of IP region data, fronted by a bounded in-memory LRU.
+
+    One connection in WAL mode is kept open for the lifetime of the cache, and bulk
+    reads and writes go through ``get_many``/``set_many`` so a whole batch of IPs costs
+    a handful of queries and a single commit.
+    """
+
     DB_NAME = "geo.db"
+    CACHE_SIZE = 20000
 
-    def __init__(self):
-        self._init_db()
-
-    def _init_db(self):
-        if not os.path.exists(self.DB_NAME):
-            with sqlite3.connect(self.DB_NAME) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    """CREATE TABLE geo (
-                                    ip TEXT PRIMARY KEY,
-                                    country TEXT,
-                                    countryCode TEXT)"""
-                )
-                conn.commit()
-            logger.info(f"Initialized database {self.DB_NAME}")
-
-    def get(self, ip: str) -> dict:
-        with sqlite3.connect(self.DB_NAME) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM geo WHERE ip=?", (ip,))
-            row = cursor.fetchone()
-            if row:
-                return {
-                    "ip": row[0],
-                    "country": row[1],
-                    "countryCode": row[2],
-                }
-            return None
+    def __init__(self, db_name: str = DB_NAME, cache_size: int = CACHE_SIZE):
+        self.db_name = db_name
+        self.cache_size = cache_size
+        self.cache: "OrderedDict[str, dict]" = OrderedDict()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.conn = self._init_db()
+        atexit.register(self.close)
+
+    def _init_db(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_name, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS geo (
+                            ip TEXT PRIMARY KEY,
+                            country TEXT,
+                            countryCode TEXT)"""
+        )
+        conn.commit()
+        logger.info(f"Opened database {self.db_name}")
+        return conn
+
+    def get(self, ip: str) -> Optional[dict]:
+        return self.get_many([ip]).get(ip)
+
+    def get_many(self, ips: Iterable[str]) -> Dict[str, dict]:
+        found = {}
+        missing = []
+        with self._lock:
+            for ip in dict.fromkeys(ips):
+                data = self.cache.get(ip)
+                if data is not None:
+                    self.cache.move_to_end(ip)
+                    found[ip] = data
+                    self.memory_hits += 1
+                else:
+                    missing.append(ip)
+
+            for start in range(0, len(missing), QUERY_CHUNK_SIZE):
+                chunk = missing[start:start + QUERY_CHUNK_SIZE]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT ip, country, countryCode FROM geo WHERE ip IN ({placeholders})", chunk
+                ).fetchall()
+                for ip, country, country_code in rows:
+                    data = {"ip": ip, "country": country, "countryCode": country_code}
+                    found[ip] = data
+                    self._remember(ip, data)
+                self.db_hits += len(rows)
+
+            self.misses += len(missing) - sum(1 for ip in missing if ip in found)
+        return found
 
     def set(self, ip: str, data: dict):
-        with sqlite3.connect(self.DB_NAME) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """INSERT OR REPLACE INTO geo (ip, country, countryCode)
-                VALUES (:ip, :country, :countryCode)""",
-                data,
-            )
-            conn.commit()
-            logger.info(f"Cached data for IP {ip}")
+        self.set_many([data])
+
+    def set_many(self, items: Iterable[dict]):
+        rows = [(data["ip"], data.get("country"), data.get("countryCode")) for data in items]
+        if not rows:
+            return
+        with self._lock:
+            with self.conn:
+                self.conn.executemany(
+                    """INSERT OR REPLACE INTO geo (ip, country, countryCode)
+                    VALUES (?, ?, ?)""",
+                    rows,
+                )
+            for ip, country, country_code in rows:
+                self._remember(ip, {"ip": ip, "country": country, "countryCode": country_code})
+        logger.debug(f"Cached data for {len(rows)} IPs")
+
+    def _remember(self, ip: str, data: dict):
+        self.cache[ip] = data
+        self.cache.move_to_end(ip)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "cached": len(self.cache),
+        }
+
+    def close(self):
+        with self._lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+                logger.info(f"Closed database {self.db_name}: {self.stats()}")
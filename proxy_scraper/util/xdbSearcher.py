@@ -8,9 +8,12 @@
 
 import io
 import logging
+import mmap
 import socket
 import struct
 import sys
+from array import array
+from bisect import bisect_right
 
 # xdb默认参数
 HeaderInfoLength = 256
@@ -58,7 +61,7 @@ class XdbSearcher(object):
         self.initDatabase(dbfile, vectorIndex, contentBuff)
 
     def search(self, ip):
-        logger.info(f"Searching for IP: {ip}")
+        logger.debug(f"Searching for IP: {ip}")
         if isinstance(ip, str):
             if not ip.isdigit():
                 ip = self.ip2long(ip)
@@ -110,12 +113,12 @@ class XdbSearcher(object):
                     break
 
         if dataPtr < 0:
-            logger.info(f"No matching region found for IP: {ip}")
+            logger.debug(f"No matching region found for IP: {ip}")
             return ""
 
         buffer_string = self.readBuffer(dataPtr, dataLen)
         return_string = buffer_string.decode("utf-8")
-        logger.info(f"Region found for IP {ip}: {return_string}")
+        logger.debug(f"Region found for IP {ip}: {return_string}")
         return return_string
 
     def readBuffer(self, offset, length):
@@ -170,6 +173,117 @@ class XdbSearcher(object):
         self.vectorIndex = None
         self.contentBuff = None
 
+class MmapXdbSearcher(object):
+    """Searcher over an mmap'd xdb file with the indexes unpacked into typed arrays once.
+
+    The vector index is viewed in place as an array of uint32 pointers, and the segment
+    index is unpacked into parallel start/end/length/pointer arrays, so a lookup is a
+    bisect over a slice of integers instead of a seek/read or bytes slice per probe.
+    search_many() sorts a batch and walks it together with the sorted segment index in one
+    pass: an IP inside the previous IP's segment costs a comparison, and any other one a
+    short forward walk from the start of its /16 block, with no per-IP search.
+    """
+
+    def __init__(self, dbfile):
+        logger.info(f"Memory-mapping xdb file: {dbfile}")
+        self.__f = io.open(dbfile, "rb")
+        self.buff = mmap.mmap(self.__f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Header: version u16, index policy u16, created at u32, start/end index pointers u32
+        self.startIndexPtr, self.endIndexPtr = struct.unpack_from("<II", self.buff, 8)
+
+        vi_len = VectorIndexRows * VectorIndexCols * VectorIndexSize
+        self.vectorIndex = array("I", self.buff[HeaderInfoLength:HeaderInfoLength + vi_len])
+        segments = self.buff[self.startIndexPtr:self.endIndexPtr + SegmentIndexSize]
+        if sys.byteorder != "little":
+            self.vectorIndex.byteswap()
+
+        self.startIps = array("I")
+        self.endIps = array("I")
+        self.dataLens = array("H")
+        self.dataPtrs = array("I")
+        for sip, eip, dataLen, dataPtr in struct.iter_unpack("<IIHI", segments):
+            self.startIps.append(sip)
+            self.endIps.append(eip)
+            self.dataLens.append(dataLen)
+            self.dataPtrs.append(dataPtr)
+        self.regions = {}
+        logger.info(f"Loaded {len(self.startIps)} xdb segments from {dbfile}")
+
+    def _segmentRange(self, ip):
+        idx = ((ip >> 24) & 0xFF) * VectorIndexCols * 2 + ((ip >> 16) & 0xFF) * 2
+        sPtr = self.vectorIndex[idx]
+        ePtr = self.vectorIndex[idx + 1]
+        if sPtr < self.startIndexPtr:
+            return 0, 0
+        lo = (sPtr - self.startIndexPtr) // SegmentIndexSize
+        hi = min((ePtr - self.startIndexPtr) // SegmentIndexSize + 1, len(self.startIps))
+        return lo, hi
+
+    def _findSegment(self, ip):
+        lo, hi = self._segmentRange(ip)
+        i = bisect_right(self.startIps, ip, lo, hi) - 1
+        if i >= lo and ip <= self.endIps[i]:
+            return i
+        return -1
+
+    def _region(self, i):
+        dataPtr = self.dataPtrs[i]
+        region = self.regions.get(dataPtr)
+        if region is None:
+            region = self.buff[dataPtr:dataPtr + self.dataLens[i]].decode("utf-8")
+            self.regions[dataPtr] = region
+        return region
+
+    def searchByIPLong(self, ip):
+        i = self._findSegment(ip)
+        return self._region(i) if i >= 0 else ""
+
+    def searchByIPStr(self, ip):
+        return self.searchByIPLong(struct.unpack("!L", socket.inet_aton(ip))[0])
+
+    def search_many(self, ips):
+        """Resolve a batch of IPs (dotted strings or ints); returns regions in input order."""
+        longs = [ip if isinstance(ip, int) else struct.unpack("!L", socket.inet_aton(ip))[0] for ip in ips]
+        regions = [""] * len(longs)
+        if not self.startIps:
+            return regions
+        startIps, endIps = self.startIps, self.endIps
+        dataPtrs, dataLens = self.dataPtrs, self.dataLens
+        vectorIndex, startIndexPtr = self.vectorIndex, self.startIndexPtr
+        cache = self.regions
+        lastSegment = len(startIps) - 1
+        i = 0
+        start = end = -1
+        region = ""
+        for n in sorted(range(len(longs)), key=longs.__getitem__):
+            ip = longs[n]
+            if ip > end:
+                # Jump ahead to the first segment of the IP's /16 block, then walk forward to its segment
+                sPtr = vectorIndex[(ip >> 16) << 1]
+                if sPtr < startIndexPtr:
+                    continue
+                first = (sPtr - startIndexPtr) // SegmentIndexSize
+                if first > i:
+                    i = min(first, lastSegment)
+                while ip > endIps[i] and i < lastSegment:
+                    i += 1
+                start = startIps[i]
+                end = endIps[i]
+                dataPtr = dataPtrs[i]
+                region = cache.get(dataPtr)
+                if region is None:
+                    region = cache[dataPtr] = self.buff[dataPtr:dataPtr + dataLens[i]].decode("utf-8")
+            if start <= ip <= end:
+                regions[n] = region
+        return regions
+
+    def close(self):
+        self.buff.close()
+        self.__f.close()
+        logger.info("Database file closed")
+
+
 # if __name__ == '__main__':
 #     ip_array = [
 #         "1.2.3.4",
@@ -0,0 +1,28 @@
+"""Import time of the proxy value types, and a check that importing them stays free of heavy dependencies.
+
+Run from the repository root: python scripts/import_time.py
+"""
+import subprocess
+import sys
+
+HEAVY_MODULES = ['aiohttp', 'requests', 'geoip2', 'fake_useragent', 'sqlite3']
+
+
+def run(code: str) -> str:
+    return subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout.strip()
+
+
+def best_of(module: str, runs: int = 7) -> float:
+    # Every import is timed in a fresh interpreter, so nothing is already in sys.modules
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    return min(float(run(code)) for _ in range(runs))
+
+
+if __name__ == "__main__":
+    for module in ('proxy_scraper.proxy', 'proxy_scraper.proxy_batch'):
+        print(f"import {module:28} {best_of(module) * 1000:7.1f} ms")
+
+    loaded = run(f"import sys, proxy_scraper.proxy; print([m for m in {HEAVY_MODULES!r} if m in sys.modules])")
+    print("Loaded by proxy_scraper.proxy:", loaded)
+    initialized = run("from proxy_scraper.util.geo import geo_info; print(geo_info.initialized)")
+    print("GeoInfo built by proxy_scraper.util.geo:", initialized)
@@ -0,0 +1,69 @@
+"""Lines per second of parser.iter_records against the regex the txt scraper used before it.
+
+Run from the repository root: python -m scripts.parse_speed
+"""
+import random
+import re
+import time
+
+from proxy_scraper.parser import LINE_PATTERN, _to_record, iter_records
+
+LINES = 200_000
+
+
+def synthetic_list(mixed: bool) -> str:
+    lines = []
+    for i in range(LINES):
+        ip = '.'.join(str(random.randint(1, 254)) for _ in range(4))
+        port = random.randint(1, 65535)
+        if mixed and i % 10 == 0:
+            lines.append(f"socks5://user:pass@{ip}:{port} US")
+        elif mixed and i % 3 == 0:
+            lines.append(f"{ip}:{port} CN")
+        else:
+            lines.append(f"{ip}:{port}")
+    return '\n'.join(lines)
+
+
+def legacy(content: str) -> int:
+    # What TxtProxyScraper.extract_proxies did before; it only understands bare ip:port lines
+    records = []
+    for line in content.strip().split("\n"):
+        ip_port = line.strip()
+        if re.match(r'^(\d{1,3}\.){3}\d{1,3}:\d+$', ip_port):
+            ip, port = ip_port.split(":")
+            records.append((ip, port))
+    return len(records)
+
+
+def pattern_only(lines):
+    # iter_records without the plain ip:port fast path
+    for line in lines:
+        match = LINE_PATTERN.match(line.rstrip('\r\n'))
+        if match and _to_record(match):
+            yield match
+
+
+def best_of(run, runs: int = 5):
+    # The machine's noise only ever makes a run slower, so the fastest run is reported
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        parsed = run()
+        timings.append(time.perf_counter() - started)
+    return parsed, min(timings)
+
+
+if __name__ == "__main__":
+    for title, content in [
+        ("Plain ip:port list", synthetic_list(mixed=False)),
+        ("Mixed list, 40% with a scheme, credentials or country", synthetic_list(mixed=True)),
+    ]:
+        print(f"{title}: {LINES} lines, {len(content) / 1e6:.1f} MB")
+        for name, run in [
+            ("legacy re.match per line", lambda: legacy(content)),
+            ("LINE_PATTERN per line", lambda: sum(1 for _ in pattern_only(content.splitlines()))),
+            ("iter_records over lines", lambda: sum(1 for _ in iter_records(content.splitlines()))),
+        ]:
+            parsed, elapsed = best_of(run)
+            print(f"  {name:26} {parsed:>8} parsed  {LINES / elapsed:>12,.0f} lines/s")
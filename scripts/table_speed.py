@@ -0,0 +1,52 @@
+"""Time of TableRowScanner against BeautifulSoup's html.parser + select on the saved pages in tests/fixtures.
+
+Run from the repository root: python -m scripts.table_speed
+"""
+import glob
+import os
+import time
+
+from bs4 import BeautifulSoup
+
+from proxy_scraper.extractors.table import scan_table_rows
+
+FIXTURES = os.path.join(os.path.dirname(__file__), '..', 'tests', 'fixtures')
+# Each page is small, so it is parsed this many times per measurement
+REPEAT = 200
+
+
+def soup_rows(content: str):
+    return [
+        [col.text.strip() for col in row.select('td')]
+        for row in BeautifulSoup(content, 'html.parser').select('table tbody tr')
+    ]
+
+
+def scanned_rows(content: str):
+    return [[cell.text.strip() for cell in row] for row in scan_table_rows(content)]
+
+
+def best_of(parse, content: str, runs: int = 5) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        for _ in range(REPEAT):
+            parse(content)
+        timings.append((time.perf_counter() - started) / REPEAT)
+    return min(timings)
+
+
+if __name__ == "__main__":
+    for path in sorted(glob.glob(os.path.join(FIXTURES, '*.html'))):
+        with open(path, encoding='utf-8') as f:
+            content = f.read()
+        rows = scanned_rows(content)
+        assert rows == soup_rows(content), f"Scanner and BeautifulSoup disagree on {path}"
+
+        soup_elapsed = best_of(soup_rows, content)
+        scan_elapsed = best_of(scanned_rows, content)
+        source = os.path.splitext(os.path.basename(path))[0]
+        print(
+            f"{source:10} {len(rows):3} rows  BeautifulSoup {soup_elapsed * 1000:6.2f} ms"
+            f"  scanner {scan_elapsed * 1000:6.2f} ms  {soup_elapsed / scan_elapsed:4.1f}x"
+        )
@@ -0,0 +1,43 @@
+"""Lookups per second of the ip2region searchers: single lookups against MmapXdbSearcher.search_many.
+
+Run from the repository root: python -m scripts.xdb_speed [path/to/ip2region.xdb]
+The path defaults to geo.xdb_path in config.toml.
+"""
+import random
+import sys
+import time
+
+from proxy_scraper.util.geo import XDB_PATH
+from proxy_scraper.util.xdbSearcher import MmapXdbSearcher, XdbSearcher
+
+LOOKUPS = 100_000
+
+
+def best_of(run, runs: int = 5):
+    # The machine's noise only ever makes a run slower, so the fastest run is reported
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = run()
+        timings.append(time.perf_counter() - started)
+    return result, min(timings)
+
+
+if __name__ == "__main__":
+    db_path = sys.argv[1] if len(sys.argv) > 1 else XDB_PATH
+    ips = [random.getrandbits(32) for _ in range(LOOKUPS)]
+
+    searcher = XdbSearcher(contentBuff=XdbSearcher.loadContentFromFile(dbfile=db_path))
+    expected, elapsed = best_of(lambda: [searcher.searchByIPLong(ip) for ip in ips])
+    print(f"XdbSearcher (content buffer)  {LOOKUPS / elapsed:>12,.0f} lookups/s")
+    searcher.close()
+
+    started = time.perf_counter()
+    mmap_searcher = MmapXdbSearcher(db_path)
+    print(f"MmapXdbSearcher load          {time.perf_counter() - started:>12.2f} s")
+    single, elapsed = best_of(lambda: [mmap_searcher.searchByIPLong(ip) for ip in ips])
+    print(f"MmapXdbSearcher single        {LOOKUPS / elapsed:>12,.0f} lookups/s")
+    batch, elapsed = best_of(lambda: mmap_searcher.search_many(ips))
+    print(f"MmapXdbSearcher.search_many   {LOOKUPS / elapsed:>12,.0f} lookups/s")
+    assert expected == single == batch
+    mmap_searcher.close()
@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+from proxy_scraper.dedup import BloomFilter, ProxyDeduplicator
+from proxy_scraper.proxy import Proxy
+from proxy_scraper.proxy_batch import proxy_key
+
+CAPACITY = 20_000
+
+
+def random_keys(count: int, rng: random.Random):
+    # Shaped like real lists: a few subnets and common ports, so keys differ in few bits
+    subnets = [rng.getrandbits(24) for _ in range(50)]
+    ports = [80, 443, 1080, 3128, 8080, 8888] + list(range(10000, 10100))
+    return {
+        ((rng.choice(subnets) << 8 | rng.getrandbits(8)) << 24) | (rng.choice(ports) << 8) | rng.randrange(4)
+        for _ in range(count)
+    }
+
+
+@pytest.mark.parametrize('error_rate', [0.01, 0.001])
+def test_bloom_filter_has_no_false_negatives_and_keeps_its_error_rate(error_rate):
+    rng = random.Random(1)
+    keys = random_keys(CAPACITY, rng)
+    bloom = BloomFilter.from_keys(iter(keys), error_rate)
+
+    assert all(key in bloom for key in keys)
+
+    others = [key for key in random_keys(200_000, rng) if key not in keys]
+    false_positives = sum(1 for key in others if key in bloom)
+    # Expected error_rate * len(others) false positives; leave room for the sampling noise
+    assert false_positives / len(others) < error_rate * 1.5
+
+
+def test_empty_bloom_filter_contains_nothing():
+    bloom = BloomFilter.from_keys([])
+    assert 123 not in bloom
+
+
+def test_deduplicator_counts_duplicates_and_known_proxies():
+    known = Proxy('9.9.9.9', 80, 'http')
+    deduplicator = ProxyDeduplicator(BloomFilter.from_keys([proxy_key(known)]))
+    proxies = [
+        Proxy('1.1.1.1', 80, 'http'),
+        Proxy('1.1.1.1', 80, 'http', country='DE'),
+        Proxy('1.1.1.1', 80, 'https'),
+        Proxy('1.1.1.1', 8080, 'http'),
+        known,
+        Proxy('1.1.1.1', '80', 'http', username='user'),
+        known,
+    ]
+
+    new = [proxy for proxy in proxies if deduplicator.is_new(proxy)]
+
+    assert new == [Proxy('1.1.1.1', 80, 'http'), Proxy('1.1.1.1', 80, 'https'), Proxy('1.1.1.1', 8080, 'http')]
+    assert deduplicator.duplicates == 3
+    assert deduplicator.known == 1
+
+
+def test_deduplicator_from_raw_directory_knows_the_raw_lists(tmp_path):
+    (tmp_path / 'http.txt').write_text("1.1.1.1:80\n2.2.2.2:8080\n")
+    (tmp_path / 'socks5.txt').write_text("3.3.3.3:1080\n")
+    deduplicator = ProxyDeduplicator.from_raw_directory(str(tmp_path))
+
+    assert not deduplicator.is_new(Proxy('2.2.2.2', 8080, 'http'))
+    assert not deduplicator.is_new(Proxy('3.3.3.3', 1080, 'socks5'))
+    assert deduplicator.is_new(Proxy('3.3.3.3', 1080, 'socks4'))
+    assert deduplicator.known == 2
@@ -0,0 +1,168 @@
+import asyncio
+import socket
+
+from aiohttp import ClientSession
+
+from proxy_scraper.distributed import Coordinator
+
+TOKEN = 'test-token'
+LEASE_TIMEOUT = 0.2
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def write_raw_lists(directory, count: int):
+    directory.mkdir()
+    (directory / 'http.txt').write_text(''.join(f"10.0.0.{index}:8080\n" for index in range(1, count + 1)))
+
+
+class FakeWorker:
+    def __init__(self, session: ClientSession, url: str, name: str):
+        self.session = session
+        self.url = url
+        self.name = name
+
+    async def post(self, path: str, payload=None):
+        async with self.session.post(self.url + path, json=dict(payload or {}, worker=self.name)) as response:
+            return response.status, (await response.json() if response.status == 200 else None)
+
+    async def lease(self):
+        return await self.post('/lease')
+
+    async def send_results(self, lease):
+        rows = [row + [0.1, 0.1, 0.2] for row in lease['proxies']]
+        return await self.post(f"/results/{lease['batch_id']}", {'valid': rows})
+
+
+async def run_coordinator(tmp_path, scenario, **kwargs):
+    directory = tmp_path / 'raw'
+    write_raw_lists(directory, kwargs.pop('proxies', 4))
+    kwargs.setdefault('lease_timeout', LEASE_TIMEOUT)
+    coordinator = Coordinator('127.0.0.1', free_port(), str(directory), batch_size=2, token=TOKEN, **kwargs)
+    valid = []
+
+    async def consume():
+        async for proxy, _ in coordinator.iter_valid():
+            valid.append(proxy.host)
+
+    consumer = asyncio.create_task(consume())
+    await wait_for_port(coordinator.port)
+    headers = {'Authorization': f"Bearer {TOKEN}"}
+    async with ClientSession(headers=headers) as first, ClientSession(headers=headers) as second:
+        a, b = FakeWorker(first, coordinator.url, 'a'), FakeWorker(second, coordinator.url, 'b')
+        await scenario(coordinator, a, b)
+        # Every worker that asked for work learns that the run is over, so the coordinator does not wait for it
+        for worker in (a, b):
+            if worker.name in coordinator.workers - coordinator.released:
+                await finish(worker)
+    await asyncio.wait_for(consumer, 10)
+    return coordinator, valid
+
+
+async def wait_for_port(port: int):
+    for _ in range(100):
+        try:
+            _, writer = await asyncio.open_connection('127.0.0.1', port)
+        except OSError:
+            await asyncio.sleep(0.05)
+            continue
+        writer.close()
+        await writer.wait_closed()
+        return
+    raise AssertionError(f"coordinator never listened on port {port}")
+
+
+async def finish(worker):
+    while True:
+        status, lease = await worker.lease()
+        if status == 410:
+            return
+        if status == 200:
+            await worker.send_results(lease)
+        else:
+            await asyncio.sleep(0.05)
+
+
+async def wait_for_requeue(coordinator, batch_id: int):
+    for _ in range(100):
+        if batch_id in coordinator.pending or batch_id in coordinator.abandoned:
+            return
+        await asyncio.sleep(LEASE_TIMEOUT / 4)
+    raise AssertionError(f"batch {batch_id} was never reaped")
+
+
+def test_expired_lease_is_requeued_and_late_result_accepted(tmp_path):
+    outcome = {}
+
+    async def scenario(coordinator, a, b):
+        status, lease = await a.lease()
+        assert status == 200 and lease['batch_id'] == 0
+
+        # a stops renewing, so the batch goes to b
+        await wait_for_requeue(coordinator, 0)
+        status, lease_b = await b.lease()
+        assert status == 200 and lease_b['batch_id'] == 0
+        assert coordinator.batches[0].attempts == 2
+        status, _ = await a.post('/renew/0')
+        assert status == 409
+
+        # a finishes first: its late result wins, b's is turned away
+        outcome['late'] = await a.send_results(lease)
+        outcome['second'] = await b.send_results(lease_b)
+
+    coordinator, valid = asyncio.run(run_coordinator(tmp_path, scenario))
+    assert outcome['late'] == (200, {'accepted': True})
+    assert outcome['second'] == (200, {'accepted': False})
+    assert sorted(valid) == [f"10.0.0.{index}" for index in range(1, 5)]
+    assert coordinator.completed == 2 and coordinator.failed == 0
+
+
+def test_late_result_for_given_up_batch_is_accepted(tmp_path):
+    outcome = {}
+
+    async def scenario(coordinator, a, b):
+        status, lease = await a.lease()
+        assert status == 200 and lease['batch_id'] == 0
+        await wait_for_requeue(coordinator, 0)
+        outcome['failed'] = coordinator.failed
+        outcome['late'] = await a.send_results(lease)
+
+    coordinator, valid = asyncio.run(run_coordinator(tmp_path, scenario, proxies=6, max_attempts=1))
+    assert outcome['failed'] == 1
+    assert outcome['late'] == (200, {'accepted': True})
+    assert sorted(valid) == [f"10.0.0.{index}" for index in range(1, 7)]
+    assert coordinator.completed == 3 and coordinator.failed == 0
+
+
+def test_result_from_worker_without_lease_is_rejected(tmp_path):
+    outcome = {}
+
+    async def scenario(coordinator, a, b):
+        status, lease = await a.lease()
+        assert status == 200
+        outcome['stray'] = await b.send_results(lease)
+        outcome['holder'] = await a.send_results(lease)
+
+    asyncio.run(run_coordinator(tmp_path, scenario, proxies=2, lease_timeout=30))
+    assert outcome['stray'][0] == 403
+    assert outcome['holder'] == (200, {'accepted': True})
+
+
+def test_requests_without_token_are_rejected(tmp_path):
+    outcome = {}
+
+    async def scenario(coordinator, a, b):
+        async with ClientSession() as session:
+            async with session.post(coordinator.url + '/lease', json={'worker': 'c'}) as response:
+                outcome['anonymous'] = response.status
+            headers = {'Authorization': 'Bearer wrong'}
+            async with session.post(coordinator.url + '/lease', json={'worker': 'c'}, headers=headers) as response:
+                outcome['wrong'] = response.status
+        await finish(a)
+
+    asyncio.run(run_coordinator(tmp_path, scenario, proxies=2, lease_timeout=30))
+    assert outcome == {'anonymous': 401, 'wrong': 401}
@@ -0,0 +1,131 @@
+import asyncio
+import time
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from proxy_scraper.util.geo_api import CircuitBreaker, GeoApiClient, TokenBucket
+
+
+class StubGeoApi:
+    """ip-api's batch endpoint and ipapi.co's single lookup, answering every IP with DE.
+
+    The batch endpoint has no region for 10.0.0.0/8, like ip-api for private ranges.
+    """
+
+    def __init__(self):
+        self.batch_requests = 0
+        self.fallback_requests = 0
+        self.batch_status = 200
+        self.rate_limit_headers = {}
+
+    async def batch(self, request: web.Request) -> web.Response:
+        self.batch_requests += 1
+        if self.batch_status != 200:
+            return web.Response(status=self.batch_status)
+        rows = [
+            {'status': 'fail', 'message': 'private range', 'query': ip}
+            if ip.startswith('10.')
+            else {'status': 'success', 'country': 'Germany', 'countryCode': 'DE', 'query': ip}
+            for ip in await request.json()
+        ]
+        return web.json_response(rows, headers=self.rate_limit_headers)
+
+    async def fallback(self, request: web.Request) -> web.Response:
+        self.fallback_requests += 1
+        return web.json_response({'country_name': 'Germany', 'country_code': 'DE'})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.add_routes([web.post('/batch', self.batch), web.get('/fallback/{ip}', self.fallback)])
+        return app
+
+
+async def run_with_stub(scenario):
+    stub = StubGeoApi()
+    async with TestServer(stub.app()) as server:
+
+        def client(**kwargs) -> GeoApiClient:
+            return GeoApiClient(
+                batch_url=str(server.make_url('/batch')),
+                fallback_url=f"{server.make_url('/fallback')}/{{}}",
+                fallback_requests_per_minute=6000,
+                **kwargs,
+            )
+
+        return await scenario(stub, client)
+
+
+def test_token_bucket_paces_requests_beyond_its_capacity():
+    async def acquire_times():
+        bucket = TokenBucket(rate=20, capacity=2)
+        started_at = time.monotonic()
+        times = []
+        for _ in range(4):
+            await bucket.acquire()
+            times.append(time.monotonic() - started_at)
+        return times
+
+    times = asyncio.run(acquire_times())
+    # The first two tokens are there at once, the others come every 1/20 s
+    assert times[1] < 0.02
+    assert 0.09 <= times[3] < 0.5
+
+
+def test_rate_limit_headers_pause_batch_requests():
+    async def scenario(stub, client):
+        geo_api = client(batch_size=1)
+        stub.rate_limit_headers = {'X-Rl': '0', 'X-Ttl': '1'}
+        started_at = time.monotonic()
+        results = await geo_api.lookup_many(['1.1.1.1', '2.2.2.2'])
+        return results, time.monotonic() - started_at
+
+    results, elapsed = asyncio.run(run_with_stub(scenario))
+    assert results['2.2.2.2']['countryCode'] == 'DE'
+    # The second batch waits for the window that the first response said was used up
+    assert elapsed >= 0.9
+
+
+def test_circuit_breaker_opens_and_closes():
+    async def scenario(stub, client):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.3)
+        geo_api = client(batch_size=1, breaker=breaker)
+
+        stub.batch_status = 500
+        results = await geo_api.lookup_many(['1.1.1.1', '2.2.2.2', '3.3.3.3'])
+        # Two failed batches open the breaker, the third IP goes straight to the fallback
+        assert stub.batch_requests == 2
+        assert stub.fallback_requests == 3
+        assert breaker.is_open
+        assert sorted(results) == ['1.1.1.1', '2.2.2.2', '3.3.3.3']
+
+        # Half-open after the reset timeout: a single failure opens it again
+        await asyncio.sleep(0.3)
+        await geo_api.lookup_many(['4.4.4.4'])
+        assert stub.batch_requests == 3
+        assert breaker.is_open
+
+        # A successful trial request closes it
+        stub.batch_status = 200
+        await asyncio.sleep(0.3)
+        results = await geo_api.lookup_many(['5.5.5.5', '6.6.6.6'])
+        assert stub.batch_requests == 5
+        assert stub.fallback_requests == 4
+        assert not breaker.is_open and breaker.failures == 0
+        assert results['6.6.6.6']['countryCode'] == 'DE'
+
+    asyncio.run(run_with_stub(scenario))
+
+
+def test_ips_the_batch_endpoint_cannot_place_skip_the_fallback():
+    async def scenario(stub, client):
+        geo_api = client()
+        results = await geo_api.lookup_many(['1.1.1.1', '10.0.0.1'])
+
+        assert stub.batch_requests == 1
+        assert stub.fallback_requests == 0
+        assert results['1.1.1.1']['countryCode'] == 'DE'
+        # Returned with an empty country so that the cache remembers it
+        assert results['10.0.0.1'] == {'ip': '10.0.0.1', 'country': '', 'countryCode': ''}
+
+    asyncio.run(run_with_stub(scenario))
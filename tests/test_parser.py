@@ -0,0 +1,50 @@
+import pytest
+
+from proxy_scraper.parser import ProxyRecord, iter_records
+
+
+def parse(line: str):
+    return next(iter_records([line]), None)
+
+
+@pytest.mark.parametrize('line, record', [
+    ("1.2.3.4:8080", ProxyRecord('1.2.3.4', 8080, None, None, None, None)),
+    ("1.2.3.4:8080\r\n", ProxyRecord('1.2.3.4', 8080, None, None, None, None)),
+    ("  1.2.3.4:80  \n", ProxyRecord('1.2.3.4', 80, None, None, None, None)),
+    ("socks5://1.2.3.4:1080", ProxyRecord('1.2.3.4', 1080, 'socks5', None, None, None)),
+    ("HTTPS://1.2.3.4:443", ProxyRecord('1.2.3.4', 443, 'https', None, None, None)),
+    ("user:pass@1.2.3.4:3128", ProxyRecord('1.2.3.4', 3128, None, 'user', 'pass', None)),
+    ("socks4://user:@1.2.3.4:1080", ProxyRecord('1.2.3.4', 1080, 'socks4', 'user', '', None)),
+    ("1.2.3.4:8080 cn", ProxyRecord('1.2.3.4', 8080, None, None, None, 'CN')),
+    ("1.2.3.4:8080,US,elite", ProxyRecord('1.2.3.4', 8080, None, None, None, 'US')),
+    ("http://u:p@1.2.3.4:80 DE", ProxyRecord('1.2.3.4', 80, 'http', 'u', 'p', 'DE')),
+    ("1.2.3.4:65535", ProxyRecord('1.2.3.4', 65535, None, None, None, None)),
+])
+def test_accepted_formats(line, record):
+    assert parse(line) == record
+
+
+@pytest.mark.parametrize('line', [
+    "1.2.3.4:0",
+    "1.2.3.4:65536",
+    "1.2.3.4:123456",
+    "1.2.3.4",
+    "1.2.3.4:",
+    "1234.1.2.3:80",
+    "ftp://1.2.3.4:21",
+    "1.2.3.4:8080x",
+    # Digits other than 0-9 are rejected on the fast path and by LINE_PATTERN alike
+    "1.2.3.4:٣٣",
+    "١.2.3.4:80",
+    "",
+    "# comment",
+])
+def test_rejected_lines(line):
+    assert parse(line) is None
+
+
+def test_iter_records_keeps_order_across_both_paths():
+    lines = ["1.1.1.1:80\n", "junk\n", "socks5://2.2.2.2:1080 US\n", "3.3.3.3:8080\n"]
+    assert [(record.host, record.protocol) for record in iter_records(lines)] == [
+        ('1.1.1.1', None), ('2.2.2.2', 'socks5'), ('3.3.3.3', None),
+    ]
@@ -0,0 +1,71 @@
+import pytest
+
+from proxy_scraper.parser import ProxyRecord
+from proxy_scraper.protocol import Protocol
+from proxy_scraper.proxy import Proxy, int_to_ip, ip_to_int
+
+
+def fields(proxy: Proxy):
+    return proxy.host, proxy.port, proxy.protocol, proxy.username, proxy.password, proxy.country
+
+
+def test_equality_and_hash_ignore_country_and_credentials():
+    proxy = Proxy('1.2.3.4', '80', 'http')
+    same = Proxy('1.2.3.4', 80, Protocol.HTTP, username='user', password='secret', country='de')
+
+    assert proxy == same
+    assert hash(proxy) == hash(same)
+    assert len({proxy, same}) == 1
+    assert proxy != Proxy('1.2.3.4', 80, 'https')
+    assert proxy != Proxy('1.2.3.4', 81, 'http')
+    assert proxy != Proxy('1.2.3.5', 80, 'http')
+    assert proxy != '1.2.3.4:80'
+
+
+@pytest.mark.parametrize('port', [8080, '8080', ' 8080 '])
+def test_port_may_be_a_string_or_an_int(port):
+    proxy = Proxy('1.2.3.4', port, 'socks5')
+    assert proxy.port == 8080
+    assert str(proxy) == 'socks5://1.2.3.4:8080'
+    assert proxy.get_address() == '1.2.3.4:8080'
+
+
+def test_empty_optional_fields_are_stored_as_none():
+    proxy = Proxy('1.2.3.4', 80, 'http', username='', password='', country='')
+    assert fields(proxy) == ('1.2.3.4', 80, Protocol.HTTP, None, None, None)
+
+
+def test_from_record_uses_the_default_protocol_only_when_the_line_has_none():
+    record = ProxyRecord('1.2.3.4', 1080, None, 'user', 'secret', 'US')
+    assert fields(Proxy.from_record(record, 'socks4')) == ('1.2.3.4', 1080, Protocol.SOCKS4, 'user', 'secret', 'US')
+
+    record = ProxyRecord('1.2.3.4', 1080, 'socks5', None, None, None)
+    assert Proxy.from_record(record, 'http').protocol is Protocol.SOCKS5
+
+
+def test_from_packed_round_trip():
+    proxy = Proxy('203.0.113.7', 3128, 'https', username='user', password='secret', country='NL')
+    packed = Proxy.from_packed(
+        proxy.ip, proxy.port, proxy.protocol, username=proxy.username, password=proxy.password, country=proxy.country
+    )
+
+    assert fields(packed) == fields(proxy)
+    assert packed == proxy and hash(packed) == hash(proxy)
+    assert int_to_ip(ip_to_int('203.0.113.7')) == '203.0.113.7'
+
+
+@pytest.mark.parametrize('host, port, protocol', [
+    ('1.2.3.4', 0, 'http'),
+    ('1.2.3.4', 65536, 'http'),
+    ('1.2.3.4', '-1', 'http'),
+    ('1.2.3.4', 'http', 'http'),
+    ('1.2.3.4', 80, 'ftp'),
+    ('1.2.3.4', 80, ''),
+    ('1.2.3', 80, 'http'),
+    ('256.1.1.1', 80, 'http'),
+    ('example.com', 80, 'http'),
+    ('::1', 80, 'http'),
+])
+def test_invalid_fields_raise_value_error(host, port, protocol):
+    with pytest.raises(ValueError):
+        Proxy(host, port, protocol)
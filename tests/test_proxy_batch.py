@@ -0,0 +1,127 @@
+import asyncio
+import sys
+import types
+
+from proxy_scraper.protocol import Protocol
+from proxy_scraper.proxy import Proxy, ProxyTiming
+from proxy_scraper.proxy_batch import UNKNOWN_COUNTRY, UNRESOLVABLE, UNRESOLVED, ProxyBatch
+
+
+def fields(proxy: Proxy):
+    return proxy.host, proxy.port, proxy.protocol, proxy.username, proxy.password, proxy.country
+
+
+def timing(total: float) -> ProxyTiming:
+    return ProxyTiming(total / 4, total / 2, total)
+
+
+def test_append_and_iterate_round_trip():
+    proxies = [
+        Proxy('1.2.3.4', 8080, 'http'),
+        Proxy('5.6.7.8', '1080', 'socks5', username='user', password='secret', country='de'),
+        Proxy('255.255.255.255', 65535, Protocol.HTTPS, country='US'),
+        Proxy('0.0.0.1', 1, 'socks4', username='user'),
+    ]
+    batch = ProxyBatch.from_proxies(proxies)
+
+    assert len(batch) == 4
+    assert [fields(proxy) for proxy in batch] == [
+        ('1.2.3.4', 8080, Protocol.HTTP, None, None, None),
+        ('5.6.7.8', 1080, Protocol.SOCKS5, 'user', 'secret', 'DE'),
+        ('255.255.255.255', 65535, Protocol.HTTPS, None, None, 'US'),
+        ('0.0.0.1', 1, Protocol.SOCKS4, 'user', None, None),
+    ]
+    assert fields(batch[1]) == fields(list(batch)[1])
+    assert ProxyBatch.from_proxies(batch) is batch
+
+
+def test_timings_are_only_kept_for_rows_that_have_one():
+    batch = ProxyBatch()
+    batch.append(Proxy('1.1.1.1', 80, 'http'), None)
+    batch.append(Proxy('2.2.2.2', 80, 'http'), timing(0.4))
+    assert batch.timings == {1: timing(0.4)}
+
+    other = ProxyBatch()
+    other.append(Proxy('3.3.3.3', 80, 'http'), timing(0.2))
+    other.append(Proxy('4.4.4.4', 80, 'http'))
+    batch.extend(other)
+    assert batch.timings == {1: timing(0.4), 2: timing(0.2)}
+    assert batch.take([3, 2, 0]).timings == {1: timing(0.2)}
+
+
+def test_ranked_orders_by_total_time_with_untimed_rows_last():
+    batch = ProxyBatch()
+    batch.append(Proxy('4.4.4.4', 80, 'http'))
+    batch.append(Proxy('1.1.1.1', 80, 'http'), timing(0.3))
+    batch.append(Proxy('3.3.3.3', 80, 'http'))
+    batch.append(Proxy('2.2.2.2', 80, 'http'), timing(0.1))
+    batch.append(Proxy('5.5.5.5', 80, 'http'), timing(0.2))
+
+    hosts = [proxy.host for proxy in batch.ranked()]
+    assert hosts == ['2.2.2.2', '5.5.5.5', '1.1.1.1', '3.3.3.3', '4.4.4.4']
+    assert [proxy.host for proxy in batch.ranked(max_latency=0.2)] == ['2.2.2.2', '5.5.5.5']
+    assert [proxy.host for proxy in batch.ranked(top=4)] == hosts[:4]
+    assert [t.total for t in batch.ranked().timings.values()] == [0.1, 0.2, 0.3]
+
+
+def test_ranked_keeps_a_proxy_appended_twice_and_unique_removes_it():
+    proxy = Proxy('1.1.1.1', 80, 'http')
+    batch = ProxyBatch()
+    batch.append(proxy, timing(0.5))
+    batch.append(Proxy('2.2.2.2', 80, 'http'), timing(0.3))
+    batch.append(Proxy('1.1.1.1', 80, 'http', country='FR'), timing(0.1))
+
+    # ranked does not deduplicate: the same proxy shows up once per row
+    assert [proxy.host for proxy in batch.ranked()] == ['1.1.1.1', '2.2.2.2', '1.1.1.1']
+
+    unique = batch.unique()
+    # The first row of each proxy is kept, with its own timing and country
+    assert [fields(proxy) for proxy in unique] == [
+        ('1.1.1.1', 80, Protocol.HTTP, None, None, None),
+        ('2.2.2.2', 80, Protocol.HTTP, None, None, None),
+    ]
+    assert unique.timings == {0: timing(0.5), 1: timing(0.3)}
+    assert unique.unique() is unique
+
+
+def test_unique_tells_protocols_and_ports_apart():
+    batch = ProxyBatch.from_proxies([
+        Proxy('1.1.1.1', 80, 'http'),
+        Proxy('1.1.1.1', 80, 'https'),
+        Proxy('1.1.1.1', 81, 'http'),
+        Proxy('1.1.1.1', 80, 'http', username='user'),
+    ])
+    assert len(batch.unique()) == 3
+
+
+def test_resolve_countries_looks_up_each_missing_ip_once(monkeypatch):
+    lookups = []
+
+    async def resolve_many(ips):
+        ips = list(ips)
+        lookups.append(ips)
+        regions = {'1.1.1.1': {'countryCode': 'au'}, '2.2.2.2': {'countryCode': ''}}
+        return {ip: regions[ip] for ip in ips if ip in regions}
+
+    geo = types.ModuleType('proxy_scraper.util.geo')
+    geo.geo_info = types.SimpleNamespace(resolve_many=resolve_many)
+    monkeypatch.setitem(sys.modules, 'proxy_scraper.util.geo', geo)
+
+    batch = ProxyBatch.from_proxies([
+        Proxy('1.1.1.1', 80, 'http'),
+        Proxy('1.1.1.1', 1080, 'socks5'),
+        Proxy('2.2.2.2', 80, 'http'),
+        Proxy('3.3.3.3', 80, 'http'),
+        Proxy('4.4.4.4', 80, 'http', country='JP'),
+    ])
+    assert batch.countries[0] == UNRESOLVED
+    asyncio.run(batch.resolve_countries())
+
+    assert [sorted(ips) for ips in lookups] == [['1.1.1.1', '2.2.2.2', '3.3.3.3']]
+    assert list(batch.country_codes()) == ['AU', 'AU', UNKNOWN_COUNTRY, UNKNOWN_COUNTRY, 'JP']
+    # Looked up without a result: not looked up again, and not reported as a country
+    assert batch.countries[2] == batch.countries[3] == UNRESOLVABLE
+    assert batch[3].country is None
+
+    asyncio.run(batch.resolve_countries())
+    assert len(lookups) == 1
@@ -0,0 +1,74 @@
+import pytest
+
+from proxy_scraper.proxy import Proxy
+from proxy_scraper.proxy_health import CheckResult, LastCheck, ProxyHealthStore, health_key
+
+RECHECK = 100
+RETRY = 10
+MAX_BACKOFF = 1000
+NOW = 1_000_000.0
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ProxyHealthStore(
+        str(tmp_path / 'health.db'), recheck_interval=RECHECK, retry_interval=RETRY, max_backoff=MAX_BACKOFF
+    )
+    yield store
+    store.close()
+
+
+def next_check(store: ProxyHealthStore, proxy: Proxy) -> float:
+    return store.conn.execute(
+        "SELECT next_check FROM health WHERE ip = ? AND port = ? AND protocol = ?", health_key(proxy)
+    ).fetchone()[0]
+
+
+def test_recent_failure_is_not_due_until_the_retry_interval(store):
+    proxy = Proxy('1.2.3.4', 80, 'http')
+    store.record_many([CheckResult(proxy, False, NOW)])
+
+    assert store.schedule(now=NOW + RETRY - 1) == {health_key(proxy): LastCheck(False, None)}
+    assert store.schedule(now=NOW + RETRY) == {}
+
+
+def test_passed_proxy_is_reused_with_its_latency(store):
+    proxy = Proxy('1.2.3.4', 80, 'socks5')
+    store.record_many([CheckResult(proxy, True, NOW, 0.25)])
+
+    assert store.schedule(now=NOW + RECHECK - 1) == {health_key(proxy): LastCheck(True, 0.25)}
+    assert store.schedule(now=NOW + RECHECK) == {}
+
+
+def test_failure_keeps_the_latency_of_the_last_success(store):
+    proxy = Proxy('1.2.3.4', 80, 'http')
+    store.record_many([CheckResult(proxy, True, NOW, 0.25)])
+    store.record_many([CheckResult(proxy, False, NOW + RECHECK)])
+
+    assert store.schedule(now=NOW + RECHECK + 1) == {health_key(proxy): LastCheck(False, 0.25)}
+
+
+def test_backoff_doubles_with_consecutive_failures_up_to_the_cap(store):
+    proxy = Proxy('1.2.3.4', 80, 'http')
+    waits = []
+    checked_at = NOW
+    for _ in range(8):
+        store.record_many([CheckResult(proxy, False, checked_at)])
+        waits.append(next_check(store, proxy) - checked_at)
+        checked_at += waits[-1]
+
+    assert waits == [10, 20, 40, 80, 160, 320, 640, MAX_BACKOFF]
+
+    # A success resets the streak
+    store.record_many([CheckResult(proxy, True, checked_at)])
+    store.record_many([CheckResult(proxy, False, checked_at + 1)])
+    assert next_check(store, proxy) == checked_at + 1 + RETRY
+
+
+def test_prune_drops_only_rows_older_than_max_age(store):
+    old, recent = Proxy('1.1.1.1', 80, 'http'), Proxy('2.2.2.2', 80, 'http')
+    store.record_many([CheckResult(old, True, NOW - 500, 0.1), CheckResult(recent, False, NOW - 100)])
+
+    assert store.prune(max_age=200, now=NOW) == 1
+    rows = store.conn.execute("SELECT ip FROM health").fetchall()
+    assert rows == [(recent.ip,)]
@@ -0,0 +1,118 @@
+import os
+
+import pytest
+
+from proxy_scraper.proxy import Proxy
+from proxy_scraper.raw_store import INDEX_SUFFIX, RawProxyFile, RawProxyStore
+
+LINES = [
+    "1.1.1.1:80\n",
+    "2.2.2.2:8080\n",
+    "1.1.1.1:80\n",
+    "not a proxy\n",
+    "socks5://3.3.3.3:1080\n",
+    "2.2.2.2:8080\n",
+]
+
+
+@pytest.fixture
+def parsed(monkeypatch):
+    """Lines parsed from the lists, which stays empty while the indexes are reused."""
+    lines = []
+    index_lines = RawProxyFile._index_lines
+
+    def counting(self, new_lines):
+        lines.extend(new_lines)
+        index_lines(self, new_lines)
+
+    monkeypatch.setattr(RawProxyFile, '_index_lines', counting)
+    return lines
+
+
+@pytest.fixture
+def raw_path(tmp_path):
+    path = tmp_path / 'http.txt'
+    path.write_text(''.join(LINES))
+    return str(path)
+
+
+def indexed(raw_path) -> RawProxyFile:
+    raw_file = RawProxyFile(raw_path, 'http')
+    raw_file.save_index()
+    return raw_file
+
+
+def test_valid_index_is_reused_with_the_stale_line_count(raw_path, parsed):
+    saved = indexed(raw_path)
+    assert saved.stale_lines == 3
+    parsed.clear()
+
+    loaded = RawProxyFile(raw_path, 'http')
+
+    assert parsed == []
+    assert loaded.keys == saved.keys
+    assert (loaded.lines, loaded.stale_lines) == (6, 3)
+    assert Proxy('3.3.3.3', 1080, 'socks5') in loaded
+
+
+def test_index_is_rebuilt_when_the_list_grew(raw_path, parsed):
+    indexed(raw_path)
+    with open(raw_path, 'a') as f:
+        f.write("4.4.4.4:3128\n")
+    parsed.clear()
+
+    loaded = RawProxyFile(raw_path, 'http')
+
+    assert len(parsed) == len(LINES) + 1
+    assert Proxy('4.4.4.4', 3128, 'http') in loaded
+    assert (loaded.lines, loaded.stale_lines) == (7, 3)
+
+
+def test_index_is_rebuilt_when_the_mtime_changed(raw_path, parsed):
+    indexed(raw_path)
+    stat = os.stat(raw_path)
+    os.utime(raw_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    parsed.clear()
+
+    assert len(RawProxyFile(raw_path, 'http').keys) == 3
+    assert len(parsed) == len(LINES)
+
+
+@pytest.mark.parametrize('cut', [1, 8])
+def test_truncated_index_is_rebuilt(raw_path, parsed, cut):
+    index_path = raw_path + INDEX_SUFFIX
+    saved = indexed(raw_path)
+    os.truncate(index_path, os.path.getsize(index_path) - cut)
+    parsed.clear()
+
+    loaded = RawProxyFile(raw_path, 'http')
+
+    assert len(parsed) == len(LINES)
+    assert loaded.keys == saved.keys
+
+
+def test_compaction_keeps_exactly_one_line_per_key(tmp_path, raw_path, parsed):
+    store = RawProxyStore(str(tmp_path), compact_ratio=0.1)
+
+    assert store.compact() == 1
+
+    with open(raw_path) as f:
+        lines = f.readlines()
+    assert lines == ["1.1.1.1:80\n", "2.2.2.2:8080\n", "socks5://3.3.3.3:1080\n"]
+    parsed.clear()
+    loaded = RawProxyFile(raw_path, 'http')
+    assert parsed == []
+    assert (len(loaded.keys), loaded.stale_lines) == (3, 0)
+    assert store.compact() == 0
+
+
+def test_flush_saves_the_index_without_rewriting_the_list(tmp_path, raw_path):
+    store = RawProxyStore(str(tmp_path), compact_ratio=0.1)
+    assert store.add([Proxy('4.4.4.4', 3128, 'http'), Proxy('1.1.1.1', 80, 'http')]) == 1
+
+    store.flush()
+
+    with open(raw_path) as f:
+        assert f.read() == ''.join(LINES) + "4.4.4.4:3128\n"
+    assert os.path.exists(raw_path + INDEX_SUFFIX)
+    assert RawProxyFile(raw_path, 'http').stale_lines == 3
@@ -0,0 +1,46 @@
+import asyncio
+import queue
+import time
+
+from proxy_scraper import sharding
+
+
+class SlowValidator:
+    """Passes every proxy, but only yields the second one after the first has been sent."""
+
+    def __init__(self, health_store=None):
+        self.results = None
+        self.first_sent_after = None
+
+    async def iter_valid(self, proxies):
+        started_at = time.monotonic()
+        sent = False
+        async for proxy in proxies:
+            yield proxy, None
+            while not sent and time.monotonic() - started_at < 2:
+                await asyncio.sleep(0.01)
+                sent = not self.results.empty()
+            if sent and self.first_sent_after is None:
+                self.first_sent_after = time.monotonic() - started_at
+
+
+def test_shard_sends_a_partial_batch_every_result_interval(tmp_path, monkeypatch):
+    (tmp_path / 'http.txt').write_text("1.1.1.1:80\n2.2.2.2:80\n3.3.3.3:80\n")
+    results = queue.Queue()
+    validator = SlowValidator()
+    validator.results = results
+    monkeypatch.setattr(sharding, 'ProxyValidator', lambda health_store=None: validator)
+    monkeypatch.setattr(sharding, 'HEALTH_CONFIG', {'enabled': False})
+    monkeypatch.setattr(sharding, 'RESULT_INTERVAL', 0.1)
+
+    asyncio.run(sharding._validate_shard(0, 1, str(tmp_path), results))
+
+    # The first proxy went out on the timer, long before the batch was full or the shard done
+    assert validator.first_sent_after is not None and validator.first_sent_after < 1
+    batches = []
+    while not results.empty():
+        index, batch = results.get()
+        assert index == 0
+        batches.append([proxy.host for proxy in batch])
+    assert batches[0] == ['1.1.1.1']
+    assert sorted(ip for batch in batches for ip in batch) == ['1.1.1.1', '2.2.2.2', '3.3.3.3']
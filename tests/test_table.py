@@ -0,0 +1,103 @@
+import asyncio
+import os
+
+import pytest
+
+from proxy_scraper.extractors.table import TableCell, scan_table_rows
+
+BeautifulSoup = pytest.importorskip('bs4').BeautifulSoup
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def read_fixture(source: str) -> str:
+    with open(os.path.join(FIXTURES, f'{source}.html'), encoding='utf-8') as f:
+        return f.read()
+
+
+def legacy_rows(source: str, content: str):
+    """(ip, port, protocol, country) of every row, as the BeautifulSoup extractors read them."""
+    rows = []
+    for row in BeautifulSoup(content, 'html.parser').select('table tbody tr'):
+        cols = row.select('td')
+        if source == 'ip3366' and len(cols) >= 5:
+            rows.append((cols[0].text.strip(), cols[1].text.strip(), cols[3].text.strip().lower()))
+        elif source == 'ip89' and len(cols) >= 5:
+            rows.append((cols[0].text.strip(), cols[1].text.strip(), 'http'))
+        elif source == 'kuaidaili' and len(cols) >= 4:
+            protocol = cols[3].text.strip().lower()
+            rows.append((cols[0].text.strip(), cols[1].text.strip(), 'http' if protocol == 'http(s)' else protocol))
+        elif source == 'proxydb' and len(cols) >= 5:
+            ip, port = cols[0].text.strip().split(':')
+            rows.append((ip, port, cols[4].text.strip().lower()))
+        elif source == 'zdaye' and len(cols) >= 2:
+            is_https = cols[5].find('div', class_='iyes') is not None
+            rows.append((cols[0].text.strip(), cols[1].text.strip(), 'https' if is_https else 'http'))
+    return [(ip, int(port), protocol, None) for ip, port, protocol in rows]
+
+
+def make_scraper(source: str):
+    # The extractors import the browser pool, which needs playwright
+    pytest.importorskip('playwright')
+    from proxy_scraper.extractors.ip3366 import IP3366
+    from proxy_scraper.extractors.ip89 import IP89
+    from proxy_scraper.extractors.kuaidaili import KuaidailiScraper
+    from proxy_scraper.extractors.proxydb import ProxyDBScraper
+    from proxy_scraper.extractors.zdaye import ZdayeScraper
+
+    scrapers = {
+        'ip3366': IP3366, 'ip89': IP89, 'kuaidaili': KuaidailiScraper, 'proxydb': ProxyDBScraper, 'zdaye': ZdayeScraper,
+    }
+    return scrapers[source]()
+
+
+@pytest.mark.parametrize('source', ['ip3366', 'ip89', 'kuaidaili', 'proxydb', 'zdaye'])
+def test_scanner_matches_beautifulsoup_extraction(source):
+    scraper = make_scraper(source)
+    content = read_fixture(source)
+    proxies = scraper.extract_proxies(content)
+
+    assert proxies
+    assert [(p.host, p.port, p.protocol.value, p.country) for p in proxies] == legacy_rows(source, content)
+
+
+def test_rows_outside_tbody_and_omitted_end_tags():
+    content = """
+        <table><tr><td>header row without tbody</td></tr></table>
+        <table><thead><tr><td>head</td></tr></thead><tbody>
+            <tr><td>1.1.1.1<td><span class="a b">80</span>
+            <tr><td>2.2.2.2</td><td>8080</td></tr>
+        </tbody></table>
+    """
+    rows = [[TableCell(cell.text.strip(), cell.classes) for cell in row] for row in scan_table_rows(content)]
+    assert rows == [
+        [TableCell('1.1.1.1', frozenset()), TableCell('80', frozenset({'a', 'b'}))],
+        [TableCell('2.2.2.2', frozenset()), TableCell('8080', frozenset())],
+    ]
+
+
+def test_fetched_page_is_scanned_once(monkeypatch):
+    scraper = make_scraper('ip3366')
+    from proxy_scraper.extractors import base
+
+    scans = []
+
+    def counting_scan(content):
+        scans.append(content)
+        return scan_table_rows(content)
+
+    async def fetch_text(url):
+        return read_fixture('ip3366')
+
+    async def collect(job):
+        proxies.extend(job())
+
+    proxies = []
+    monkeypatch.setattr(base, 'scan_table_rows', counting_scan)
+    monkeypatch.setattr(base.http_client, 'fetch_text', fetch_text)
+    monkeypatch.setattr(base.fetch_strategies, 'set', lambda source, strategy: None)
+    monkeypatch.setattr(scraper, 'get_urls', lambda: ['http://www.ip3366.net/free/?stype=1'])
+    asyncio.run(scraper.fetch(collect))
+
+    assert len(scans) == 1
+    assert len(proxies) == len(legacy_rows('ip3366', read_fixture('ip3366')))
@@ -0,0 +1,26 @@
+import asyncio
+import threading
+
+from proxy_scraper import transport
+from proxy_scraper.http_client import HttpClient
+
+
+def test_user_agent_is_loaded_off_the_event_loop(monkeypatch):
+    threads = []
+
+    def get_headers():
+        threads.append(threading.current_thread())
+        return {'User-Agent': 'test-agent'}
+
+    monkeypatch.setattr(transport, 'get_headers', get_headers)
+
+    async def opened_user_agents():
+        async with transport.ValidationTransport() as validation:
+            validation_agent = validation.session.headers['User-Agent']
+        client = HttpClient()
+        session = await client.get_session()
+        await client.close()
+        return validation_agent, session.headers['User-Agent']
+
+    assert asyncio.run(opened_user_agents()) == ('test-agent', 'test-agent')
+    assert threads and threading.main_thread() not in threads
@@ -0,0 +1,93 @@
+import random
+import struct
+
+import pytest
+
+from proxy_scraper.util.xdbSearcher import (
+    HeaderInfoLength,
+    MmapXdbSearcher,
+    SegmentIndexSize,
+    VectorIndexCols,
+    VectorIndexRows,
+    VectorIndexSize,
+    XdbSearcher,
+)
+
+REGIONS = ["中国|0|广东省|深圳市|电信", "美国|0|0|0|0", "德国|0|黑森|法兰克福|0", "0|0|0|内网IP|内网IP"]
+# A /16 block without segments; the searchers return "" for it
+GAP_BLOCK = 0x0A0B
+
+
+def write_xdb(path, splits: int = 4):
+    """Write an xdb file covering every /16 block except GAP_BLOCK, each split into ``splits`` segments."""
+    segments = []
+    for block in range(VectorIndexRows * VectorIndexCols):
+        if block == GAP_BLOCK:
+            continue
+        step = 0x10000 // splits
+        for k in range(splits):
+            start = (block << 16) + k * step
+            segments.append((start, start + step - 1, REGIONS[(block + k) % len(REGIONS)]))
+
+    data = bytearray()
+    region_ptrs = {}
+    data_start = HeaderInfoLength + VectorIndexRows * VectorIndexCols * VectorIndexSize
+    for region in REGIONS:
+        region_ptrs[region] = data_start + len(data)
+        data += region.encode('utf-8')
+
+    start_index_ptr = data_start + len(data)
+    vector_index = bytearray(VectorIndexRows * VectorIndexCols * VectorIndexSize)
+    index = bytearray()
+    for n, (sip, eip, region) in enumerate(segments):
+        ptr = start_index_ptr + n * SegmentIndexSize
+        offset = (sip >> 16) * VectorIndexSize
+        if not struct.unpack_from('<I', vector_index, offset)[0]:
+            struct.pack_into('<I', vector_index, offset, ptr)
+        struct.pack_into('<I', vector_index, offset + 4, ptr)
+        encoded = region.encode('utf-8')
+        index += struct.pack('<IIHI', sip, eip, len(encoded), region_ptrs[region])
+
+    header = bytearray(HeaderInfoLength)
+    struct.pack_into('<HHIII', header, 0, 2, 1, 0, start_index_ptr, start_index_ptr + len(index) - SegmentIndexSize)
+    with open(path, 'wb') as f:
+        f.write(header + vector_index + data + index)
+
+
+@pytest.fixture(scope='module')
+def xdb_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp('xdb') / 'ip2region.xdb'
+    write_xdb(path)
+    return str(path)
+
+
+@pytest.fixture
+def searcher(xdb_path):
+    searcher = MmapXdbSearcher(xdb_path)
+    yield searcher
+    searcher.close()
+
+
+def test_lookups_match_the_reference_searcher(xdb_path, searcher):
+    reference = XdbSearcher(contentBuff=XdbSearcher.loadContentFromFile(dbfile=xdb_path))
+    ips = [random.getrandbits(32) for _ in range(2000)] + [0, 0xFFFFFFFF, 0x01000000, 0x0100FFFF]
+    expected = [reference.searchByIPLong(ip) for ip in ips if ip >> 16 != GAP_BLOCK]
+
+    assert [searcher.searchByIPLong(ip) for ip in ips if ip >> 16 != GAP_BLOCK] == expected
+
+
+def test_search_many_matches_single_lookups_in_input_order(searcher):
+    ips = [random.getrandbits(32) for _ in range(5000)]
+    # Duplicates, neighbours in one segment, segment boundaries and the uncovered block
+    ips += [ips[0], ips[0] + 1, 0x01004000, 0x01003FFF, GAP_BLOCK << 16, (GAP_BLOCK << 16) + 5, 0, 0xFFFFFFFF]
+    random.shuffle(ips)
+
+    assert searcher.search_many(ips) == [searcher.searchByIPLong(ip) for ip in ips]
+
+
+def test_search_many_accepts_dotted_strings(searcher):
+    regions = searcher.search_many(['1.0.0.1', '10.11.0.1', '1.0.64.0'])
+
+    assert regions == [searcher.searchByIPStr('1.0.0.1'), "", searcher.searchByIPStr('1.0.64.0')]
+    assert regions[0] and regions[2]
+    assert searcher.search_many([]) == []